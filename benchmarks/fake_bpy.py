@@ -0,0 +1,657 @@
+"""
+A lightweight stand-in for the bpy, bmesh and mathutils modules, good enough to import bs
+outside Blender and run the benchmark scenarios. It does not draw anything: it keeps the
+datablocks in Python dicts and counts what the library asks Blender to do
+(operator calls, RNA lookups and writes, foreach calls, handler registrations, ...)
+
+    import fake_bpy
+    fake_bpy.install()      # before importing bs
+    import bs
+    ...
+    fake_bpy.counters       # collections.Counter with the counts
+    fake_bpy.reset()        # empty scene, counters set to zero
+"""
+import collections
+import sys
+import types
+
+import numpy as np
+
+counters = collections.Counter()
+_selected = set()      # the selected objects
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Generic structures
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+class Stub():
+    """It accepts any attribute, item or call, for the parts of the API that are not modelled"""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = Stub()
+        object.__setattr__(self, name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        counters["rna_writes"] += 1
+        object.__setattr__(self, name, value)
+
+    def __getitem__(self, key):
+        return Stub()
+
+    def __setitem__(self, key, value):
+        counters["rna_writes"] += 1
+
+    def __call__(self, *args, **kwargs):
+        return Stub()
+
+
+class Struct():
+    """Base of the modelled structures, every attribute write counts as one RNA write"""
+
+    def __setattr__(self, name, value):
+        if not name.startswith("_"):
+            counters["rna_writes"] += 1
+        object.__setattr__(self, name, value)
+
+
+class ID(Struct):
+    def __init__(self, name):
+        self._name = name
+        self._owner = None
+        self._props = {}
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        if self._owner is not None:
+            self._owner._rename(self, value)
+        else:
+            self._name = value
+
+    @property
+    def users(self):
+        return 0
+
+    def __getitem__(self, key):
+        return self._props[key]
+
+    def __setitem__(self, key, value):
+        counters["rna_writes"] += 1
+        self._props[key] = value
+
+    def get(self, key, default = None):
+        return self._props.get(key, default)
+
+
+class IDCollection():
+    """bpy.data.objects, bpy.data.meshes, ..."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._items = {}
+        self._suffixes = {}
+
+    def _unique(self, name):
+        if name not in self._items:
+            return name
+        i = self._suffixes.get(name, 1)
+        while "%s.%03d" % (name, i) in self._items:
+            i += 1
+        self._suffixes[name] = i + 1
+        return "%s.%03d" % (name, i)
+
+    def _rename(self, item, name):
+        del self._items[item._name]
+        item._name = self._unique(name)
+        self._items[item._name] = item
+
+    def new(self, name, *args, **kwargs):
+        counters["rna_calls"] += 1
+        item = self._factory(self._unique(name), *args, **kwargs)
+        item._owner = self
+        self._items[item._name] = item
+        return item
+
+    def remove(self, item, **kwargs):
+        counters["rna_calls"] += 1
+        _remove(item)
+
+    def get(self, name, default = None):
+        counters["rna_lookups"] += 1
+        return self._items.get(name, default)
+
+    def __getitem__(self, key):
+        counters["rna_lookups"] += 1
+        if isinstance(key, int):
+            return list(self._items.values())[key]
+        return self._items[key]
+
+    def __contains__(self, name):
+        counters["rna_lookups"] += 1
+        return name in self._items
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ElementCollection():
+    """Vertices, edges, loops, polygons, spline points and keyframe points: their
+    properties are kept as flat NumPy arrays, like the contiguous storage in Blender"""
+
+    sizes = {"co": 3, "vertices": 2, "handle_left": 3, "handle_right": 3, "vector": 3}
+
+    def __init__(self, sizes = None):
+        self._count = 0
+        self._data = {}
+        self.sizes = dict(self.sizes, **(sizes or {}))
+
+    def add(self, count = 1):
+        counters["rna_calls"] += 1
+        self._count += count
+
+    def _array(self, attribute):
+        size = self.sizes.get(attribute, 1)
+        array = self._data.get(attribute)
+        if array is None or len(array) != self._count * size:
+            grown = np.zeros(self._count * size)
+            if array is not None:
+                grown[:min(len(array), len(grown))] = array[:len(grown)]
+            self._data[attribute] = array = grown
+        return array
+
+    def foreach_get(self, attribute, values):
+        counters["foreach"] += 1
+        values[:] = self._array(attribute)
+
+    def foreach_set(self, attribute, values):
+        counters["foreach"] += 1
+        array = self._array(attribute)
+        array[:] = np.asarray(values, dtype = np.float64).ravel()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        counters["rna_lookups"] += 1
+        if isinstance(index, slice):
+            return [Stub() for _ in range(*index.indices(self._count))]
+        return Stub()
+
+    def __iter__(self):
+        return iter([Stub() for _ in range(self._count)])
+
+
+def _remove(item):
+    if isinstance(item, Object):
+        _selected.discard(item)
+        for collection in list(item._collections):
+            collection.objects._unlink(item)
+    if isinstance(item, Collection):
+        for obj in list(item.objects):
+            item.objects._unlink(obj)
+        for parent in bpy.data.collections:
+            if item in parent.children._items:
+                parent.children._items.remove(item)
+        if item in bpy.context.scene.collection.children._items:
+            bpy.context.scene.collection.children._items.remove(item)
+    if item._owner is not None:
+        item._owner._items.pop(item._name, None)
+        item._owner = None
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# Datablocks
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+class Mesh(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self._users = 0
+        self.vertices = ElementCollection()
+        self.edges = ElementCollection()
+        self.loops = ElementCollection()
+        self.polygons = ElementCollection()
+        self.attributes = Stub()
+
+    @property
+    def users(self):
+        return self._users
+
+    def update(self, *args, **kwargs):
+        counters["rna_calls"] += 1
+
+    def transform(self, matrix):
+        counters["rna_calls"] += 1
+
+
+class Curve(Mesh):
+    def __init__(self, name, type = 'CURVE'):
+        super().__init__(name)
+        object.__setattr__(self, "curve_type", type)
+        self.splines = Stub()
+        self.body = ""
+        self.align_x = self.align_y = 'LEFT'
+
+
+class FCurve(Struct):
+    def __init__(self, data_path, index):
+        self.data_path = data_path
+        self.array_index = index
+        self.keyframe_points = ElementCollection({"co": 2})
+
+    def update(self):
+        counters["rna_calls"] += 1
+
+
+class FCurves():
+    def __init__(self):
+        self._items = {}
+
+    def find(self, data_path, index = 0):
+        counters["rna_lookups"] += 1
+        return self._items.get((data_path, index))
+
+    def new(self, data_path, index = 0, action_group = ""):
+        counters["rna_calls"] += 1
+        fcurve = self._items[(data_path, index)] = FCurve(data_path, index)
+        return fcurve
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+
+class Action(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.fcurves = FCurves()
+
+
+class AnimData(Struct):
+    def __init__(self):
+        self.action = None
+
+
+class Modifiers():
+    def __init__(self):
+        self._items = {}
+
+    def new(self, name, type):
+        counters["rna_calls"] += 1
+        modifier = self._items[name] = Stub()
+        return modifier
+
+    def __getitem__(self, name):
+        counters["rna_lookups"] += 1
+        return self._items[name]
+
+
+class Object(ID):
+    def __init__(self, name, data = None):
+        super().__init__(name)
+        self._collections = []
+        self._hidden = False
+        self.data = data
+        if isinstance(data, Curve):
+            self.type = 'FONT' if data.curve_type == 'FONT' else 'CURVE'
+        else:
+            self.type = 'MESH' if isinstance(data, Mesh) else ('EMPTY' if data is None else 'CURVE')
+        self.location = [0.0, 0.0, 0.0]
+        self.rotation_euler = [0.0, 0.0, 0.0]
+        self.scale = [1.0, 1.0, 1.0]
+        self.mode = 'OBJECT'
+        self.hide_select = self.hide_viewport = self.hide_render = False
+        self.animation_data = None
+        self.modifiers = Modifiers()
+        self.parent = None
+        self.instance_type = 'NONE'
+
+    def __setattr__(self, name, value):
+        if name == "data":
+            old = self.__dict__.get("data")
+            if isinstance(old, Mesh):
+                old._users -= 1
+            if isinstance(value, Mesh):
+                value._users += 1
+        super().__setattr__(name, value)
+
+    @property
+    def users(self):
+        return len(self._collections)
+
+    @property
+    def users_collection(self):
+        return tuple(self._collections)
+
+    def select_set(self, state):
+        counters["rna_calls"] += 1
+        (_selected.add if state else _selected.discard)(self)
+
+    def select_get(self):
+        return self in _selected
+
+    def hide_set(self, state):
+        counters["rna_calls"] += 1
+        self._hidden = state
+
+    def animation_data_create(self):
+        counters["rna_calls"] += 1
+        self.animation_data = AnimData()
+        return self.animation_data
+
+    def animation_data_clear(self):
+        counters["rna_calls"] += 1
+        self.animation_data = None
+
+    def keyframe_insert(self, data_path, frame = 0, **kwargs):
+        counters["keyframe_inserts"] += 1
+        if self.animation_data is None:
+            self.animation_data_create()
+        if self.animation_data.action is None:
+            self.animation_data.action = bpy.data.actions.new(self.name + "Action")
+        value = getattr(self, data_path)
+        values = list(value) if hasattr(value, "__len__") else [value]
+        for index, v in enumerate(values):
+            fcurves = self.animation_data.action.fcurves
+            fcurve = fcurves.find(data_path, index) or fcurves.new(data_path, index)
+            fcurve.keyframe_points.add(1)
+            fcurve.keyframe_points._array("co")[-2:] = (frame, float(v))
+        return True
+
+
+class ObjectLinks():
+    def __init__(self, collection):
+        self._collection = collection
+        self._items = {}
+
+    def link(self, obj):
+        counters["rna_calls"] += 1
+        if id(obj) in self._items:
+            raise RuntimeError("Object '%s' already in collection '%s'" % (obj._name, self._collection._name))
+        self._items[id(obj)] = obj
+        obj._collections.append(self._collection)
+
+    def unlink(self, obj):
+        counters["rna_calls"] += 1
+        self._unlink(obj)
+
+    def _unlink(self, obj):
+        if self._items.pop(id(obj), None) is None:
+            raise RuntimeError("Object '%s' not in collection '%s'" % (obj._name, self._collection._name))
+        obj._collections.remove(self._collection)
+
+    def get(self, name, default = None):
+        counters["rna_lookups"] += 1
+        return next((obj for obj in self._items.values() if obj._name == name), default)
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Children():
+    def __init__(self):
+        self._items = []
+
+    def link(self, collection):
+        counters["rna_calls"] += 1
+        self._items.append(collection)
+        collection._parents += 1
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+
+class Collection(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self._parents = 0
+        self.objects = ObjectLinks(self)
+        self.children = Children()
+
+    @property
+    def users(self):
+        return self._parents
+
+    @property
+    def children_recursive(self):
+        result = []
+        for child in self.children:
+            result.append(child)
+            result.extend(child.children_recursive)
+        return result
+
+    @property
+    def all_objects(self):
+        result = list(self.objects)
+        for child in self.children_recursive:
+            result.extend(child.objects)
+        return result
+
+
+class World(ID):
+    pass
+
+
+class NodeGroup(ID):
+    def __init__(self, name, type = 'GeometryNodeTree'):
+        super().__init__(name)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        value = Stub()
+        object.__setattr__(self, name, value)
+        return value
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# bpy.data, bpy.context and bpy.app
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+class Data():
+    def __init__(self):
+        self.objects = IDCollection(Object)
+        self.meshes = IDCollection(Mesh)
+        self.curves = IDCollection(Curve)
+        self.materials = IDCollection(ID)
+        self.actions = IDCollection(Action)
+        self.collections = IDCollection(Collection)
+        self.worlds = IDCollection(World)
+        self.node_groups = IDCollection(NodeGroup)
+        self.scenes = IDCollection(ID)
+
+    def batch_remove(self, ids):
+        counters["rna_calls"] += 1
+        for item in list(ids):
+            _remove(item)
+
+
+class LayerObjects(Struct):
+    def __init__(self):
+        self.active = None
+
+
+class ViewLayer():
+    def __init__(self):
+        self.objects = LayerObjects()
+
+    def update(self):
+        counters["view_layer_updates"] += 1
+
+
+class Scene(Struct):
+    def __init__(self):
+        self.collection = Collection("Scene Collection")
+        self.frame_current = 1
+        self.world = None
+        self.camera = None
+        self.render = Stub()
+        self.cursor = Stub()
+        self.tool_settings = Stub()
+        self.transform_orientation_slots = [Stub()]
+
+    @property
+    def objects(self):
+        return bpy.data.objects
+
+    def frame_set(self, frame):
+        counters["frame_changes"] += 1
+        self.frame_current = frame
+        for handler in list(bpy.app.handlers.frame_change_pre) + list(bpy.app.handlers.frame_change_post):
+            counters["handler_calls"] += 1
+            handler(self)
+
+
+class Context():
+    def __init__(self):
+        self.scene = Scene()
+        self.view_layer = ViewLayer()
+
+    @property
+    def collection(self):
+        return self.scene.collection
+
+    @property
+    def object(self):
+        return self.view_layer.objects.active
+
+    active_object = object
+
+
+class HandlerList(list):
+    def append(self, handler):
+        counters["handlers_registered"] += 1
+        super().append(handler)
+
+
+def persistent(function):
+    function._bpy_persistent = True
+    return function
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# bpy.ops
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+def _add_object(name, data, location = (0, 0, 0), rotation = (0, 0, 0), scale = (1, 1, 1), **kwargs):
+    obj = bpy.data.objects.new(name, data)
+    bpy.context.collection.objects.link(obj)
+    obj.location = list(location)
+    obj.rotation_euler = list(rotation)
+    obj.scale = list(scale)
+    _selected.clear()
+    _selected.add(obj)
+    bpy.context.view_layer.objects.active = obj
+    return obj
+
+
+def _op_select_all(action = 'TOGGLE', **kwargs):
+    _selected.clear()
+    if action == 'SELECT':
+        _selected.update(bpy.data.objects)
+
+
+def _op_delete(**kwargs):
+    for obj in list(_selected):
+        _remove(obj)
+
+
+def _op_orphans_purge(**kwargs):
+    for datablocks in (bpy.data.meshes, bpy.data.curves, bpy.data.materials, bpy.data.actions):
+        for item in [d for d in datablocks if d.users == 0]:
+            _remove(item)
+    return {'CANCELLED'}
+
+
+def _op_world_new(**kwargs):
+    bpy.data.worlds.new("World")
+
+
+_operators = {
+    "mesh.primitive_uv_sphere_add": lambda **kw: _add_object("Sphere", bpy.data.meshes.new("Sphere"), **kw),
+    "mesh.primitive_vert_add": lambda **kw: _add_object("Vert", bpy.data.meshes.new("Vert"), **kw),
+    "object.text_add": lambda **kw: _add_object("Text", bpy.data.curves.new("Text", 'FONT'), **kw),
+    "object.camera_add": lambda **kw: _add_object("Camera", Stub(), **kw),
+    "curve.primitive_nurbs_path_add": lambda **kw: _add_object("NurbsPath", bpy.data.curves.new("NurbsPath"), **kw),
+    "curve.primitive_bezier_curve_add": lambda **kw: _add_object("BezierCurve", bpy.data.curves.new("BezierCurve"), **kw),
+    "object.modifier_add": lambda type = None, **kw: bpy.context.object.modifiers.new(type.title(), type),
+    "object.select_all": _op_select_all,
+    "object.delete": _op_delete,
+    "outliner.orphans_purge": _op_orphans_purge,
+    "world.new": _op_world_new,
+}
+
+
+class Operator():
+    def __init__(self, idname):
+        self._idname = idname
+
+    def __call__(self, *args, **kwargs):
+        counters["ops"] += 1
+        counters["ops." + self._idname] += 1
+        result = _operators.get(self._idname, lambda **kw: None)(**kwargs)
+        return result if isinstance(result, set) else {'FINISHED'}
+
+
+class OperatorModule():
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, name):
+        return Operator(self._name + "." + name)
+
+
+class Ops():
+    def __getattr__(self, name):
+        return OperatorModule(name)
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# Modules
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+bpy = types.ModuleType("bpy")
+bpy.ops = Ops()
+bpy.app = types.SimpleNamespace(version = (4, 1, 0), handlers = types.SimpleNamespace(persistent = persistent))
+
+mathutils = types.ModuleType("mathutils")
+mathutils.Matrix = Stub
+mathutils.Vector = Stub
+
+bmesh = types.ModuleType("bmesh")
+bmesh.new = Stub
+bmesh.ops = Stub()
+
+
+def reset():
+    """It empties the scene and sets every counter to zero"""
+    bpy.data = Data()
+    bpy.context = Context()
+    _selected.clear()
+    for name in ("frame_change_pre", "frame_change_post", "load_post", "undo_post", "redo_post", "depsgraph_update_post", "render_pre", "render_post"):
+        handlers = getattr(bpy.app.handlers, name, None)
+        if handlers is None:
+            setattr(bpy.app.handlers, name, HandlerList())
+        else:
+            del handlers[:]
+    bpy.data.collections.new("Collection")
+    bpy.context.scene.collection.children.link(bpy.data.collections["Collection"])
+    counters.clear()
+
+
+def install():
+    """It registers the fake modules in sys.modules, so "import bpy" finds them"""
+    reset()
+    sys.modules["bpy"] = bpy
+    sys.modules["mathutils"] = mathutils
+    sys.modules["bmesh"] = bmesh
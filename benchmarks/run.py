@@ -0,0 +1,180 @@
+"""
+Scene-build benchmarks, run outside Blender against the fake bpy of fake_bpy.py
+
+    python benchmarks/run.py                      # run and compare with baseline.json
+    python benchmarks/run.py spheres timers       # only some scenarios
+    python benchmarks/run.py --update-baseline    # store the results as the new baseline
+
+For every scenario it reports the wall time, the peak memory allocated by Python and the
+counts of operator calls, RNA lookups/writes, handler registrations and so on. The counts
+do not depend on the machine, so any count above the baseline is reported as a regression
+(exit status 1); the time is only flagged when it is more than --time-tolerance slower.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+import fake_bpy
+fake_bpy.install()
+
+import bs
+from bs import setting
+
+BASELINE = os.path.join(HERE, "baseline.json")
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# Scenarios: setup(size) builds the scene that is not measured, run(size) is measured
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+def _spheres(size):
+    for i in range(size):
+        bs.Sphere(name = "sphere%d" % i, position = (i, 0, 0))
+
+
+def _spheres_batch(size):
+    with bs.batch():
+        _spheres(size)
+
+
+def _particle_cloud(size):
+    bs.ParticleCloud(positions = np.random.default_rng(0).random((size, 3)), scales = np.full(size, 0.1))
+
+
+def _timers(size):
+    for i in range(size):
+        bs.Timer(name = "timer%d" % i)
+    for frame in range(240):
+        setting.set_timeline(frame)
+
+
+def _clean_scene(size, fast = False):
+    setting.clean_scene(fast = fast)
+
+
+def _tracks(size):
+    names = ["track%d" % i for i in range(size)]
+    for name in names:
+        bpy_object = fake_bpy.bpy.data.objects.new(name, None)
+        fake_bpy.bpy.context.collection.objects.link(bpy_object)
+    return names
+
+
+def _keyframes_loop(size, frames = 500):
+    rng = np.random.default_rng(0)
+    for name in ["track%d" % i for i in range(size)]:
+        obj = setting.get_object(name)
+        for frame, position in enumerate(rng.random((frames, 3))):
+            obj.location = tuple(position)
+            setting.put_keyframe(name, frame)
+
+
+def _keyframes_bulk(size, frames = 500):
+    values = np.random.default_rng(0).random((size, frames, 3))
+    setting.put_keyframes_array(["track%d" % i for i in range(size)], np.arange(frames), values)
+
+
+SCENARIOS = {
+    # name: (setup, run, size)
+    "spheres": (None, _spheres, 10000),
+    "spheres_batch": (None, _spheres_batch, 10000),
+    "particle_cloud": (None, _particle_cloud, 100000),
+    "timers": (None, _timers, 1000),
+    "clean_scene": (_spheres, _clean_scene, 2000),
+    "clean_scene_fast": (_spheres, lambda size: _clean_scene(size, fast = True), 20000),
+    "keyframes_loop": (_tracks, _keyframes_loop, 100),
+    "keyframes_bulk": (_tracks, _keyframes_bulk, 100),
+}
+
+
+def run_scenario(name, scale = 1.0):
+    setup, run, size = SCENARIOS[name]
+    size = max(1, int(size * scale))
+
+    fake_bpy.reset()
+    setting.invalidate_index()
+    bs._timers.clear()
+    if setup is not None:
+        setup(size)
+    fake_bpy.counters.clear()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    run(size)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = {"size": size, "time": elapsed, "peak_memory": peak}
+    result.update(sorted(fake_bpy.counters.items()))
+    return result
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# Report
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+def compare(name, result, baseline, time_tolerance):
+    """It prints one scenario and returns the list of regressions against the baseline"""
+    regressions = []
+    print("%s (size %d): %.3f s, peak %.1f MiB" % (name, result["size"], result["time"], result["peak_memory"] / 2**20))
+    for key, value in result.items():
+        if key in ("size", "time", "peak_memory") or key.startswith("ops."):
+            continue
+        print("    %-20s %d" % (key, value))
+
+    if baseline is None or baseline.get("size") != result["size"]:
+        return regressions
+    for key, value in result.items():
+        if key in ("size", "time", "peak_memory"):
+            continue
+        if value > baseline.get(key, 0):
+            regressions.append("%s: %s went from %d to %d" % (name, key, baseline.get(key, 0), value))
+    if result["time"] > baseline["time"] * (1 + time_tolerance):
+        regressions.append("%s: time went from %.3f s to %.3f s" % (name, baseline["time"], result["time"]))
+    return regressions
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs = "*", choices = [[]] + list(SCENARIOS), help = "scenarios to run (default: all)")
+    parser.add_argument("--scale", type = float, default = 1.0, help = "multiplies the size of every scenario")
+    parser.add_argument("--baseline", default = BASELINE)
+    parser.add_argument("--update-baseline", action = "store_true")
+    parser.add_argument("--time-tolerance", type = float, default = 0.5, help = "allowed relative slowdown (default: 0.5)")
+    parser.add_argument("--json", help = "also write the results to this file")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, regressions = {}, []
+    for name in args.scenarios or list(SCENARIOS):
+        results[name] = run_scenario(name, args.scale)
+        regressions += compare(name, results[name], baseline.get(name), args.time_tolerance)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent = 2)
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent = 2, sort_keys = True)
+        return 0
+
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,16 @@
 import bpy 
 from . import setting
+from . import loader
+from . import profiling
+from . import render
+from . import snapshot
+from . import integrator
+from . import spatial
+from . import store
+from . import color
+from .setting import batch
 import math
+import functools
 import numpy as np
 import pandas as pd
 
@@ -49,21 +59,38 @@ class Particle():
         bpy.data.objects[self.name].select_set(True)
         bpy.context.active_object.data.vertices[vertex].co = new_coordinate
 
+    def get_vertices_array(self):
+        """It returns the coordinates of all vertices as a (N,3) float32 array, without touching the selection"""
+        vertices = bpy.data.objects[self.name].data.vertices
+        coordinates = np.empty(len(vertices) * 3, dtype = np.float32)
+        vertices.foreach_get("co", coordinates)
+        return coordinates.reshape(-1, 3)
+
+    def set_vertices_array(self, coordinates):
+        """It writes the coordinates of all vertices at once from a (N,3) array, without touching the selection"""
+        mesh = setting.make_single_user(self.name)
+        coordinates = np.ascontiguousarray(coordinates, dtype = np.float32).reshape(-1)
+        if len(coordinates) != len(mesh.vertices) * 3:
+            raise ValueError("expected %d coordinates, got %d" % (len(mesh.vertices) * 3, len(coordinates)))
+        mesh.vertices.foreach_set("co", coordinates)
+        mesh.update()
+
 #=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 # Functions responsible to oprations of moving, rotating and resizing
 #=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     def move(self, x = 0, y = 0, z = 0):
-        bpy.data.objects[self.name].location = (x, y, z)
+        setting.set_attribute(self.name, 'location', (x, y, z))
         self.position = (x, y, z)
+        spatial.moved(self.name, self.position)
 
 
     def rotate(self, yz = 0, zx = 0, xy = 0):
-        bpy.data.objects[self.name].rotation_euler = (yz, zx, xy)
+        setting.set_attribute(self.name, 'rotation_euler', (yz, zx, xy))
         self.rotation = (yz, zx, xy)
 
 
     def resize(self, sx = 1, sy = 1, sz = 1):
-        bpy.data.objects[self.name].scale = (sx, sy, sz)
+        setting.set_attribute(self.name, 'scale', (sx, sy, sz))
         self.scale = (sx, sy, sz)
 
 
@@ -71,16 +98,16 @@ class Particle():
 # Modifiers
 #=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     def create_modifier(self, name_of_modifier = "My_Modifier", type_of_modifier = "SUBSURF"):
-        setting.set_particle_visibility(self.name)
-        bpy.context.active_object.modifiers.new(name_of_modifier, type_of_modifier)
+        return setting.get_object(self.name).modifiers.new(name_of_modifier, type_of_modifier)
 
     def create_skin(self, name_of_modifier = "Skin"):
-        setting.set_particle_visibility(self.name)
-        bpy.context.active_object.modifiers.new(name_of_modifier,"SKIN")
+        setting.make_single_user(self.name)   # the modifier adds a skin layer to the mesh
+        return setting.get_object(self.name).modifiers.new(name_of_modifier, "SKIN")
     
-    def apply_shade_smooth(self):
-        setting.set_particle_visibility(self.name)
-        bpy.ops.object.shade_smooth()   
+    def apply_shade_smooth(self, smooth = True):
+        mesh = setting.make_single_user(self.name)
+        mesh.polygons.foreach_set("use_smooth", np.full(len(mesh.polygons), smooth, dtype = bool))
+        mesh.update()
 
 
 
@@ -92,9 +119,12 @@ class Particle():
 class Sphere(Particle):
     def __init__(self, name = 'sphere', position = (0, 0, 0), rotation = (0, 0, 0), scale = (1,1,1), data = None):
         super().__init__(name = name, position = position, rotation = rotation, scale = scale, data = data)
-        
+        setting.run_or_defer(self._create, self)
+
+    def _create(self):
         bpy.ops.mesh.primitive_uv_sphere_add(radius = 1, enter_editmode = False, align = 'WORLD', location = self.position, scale = self.scale)
         bpy.context.object.name = self.name
+        bpy.context.object["bs_sphere"] = True   # lets apply_sphere_lod find it
 
 
 
@@ -104,18 +134,24 @@ class Sphere(Particle):
 class Vertice(Particle):
     def __init__(self, name = 'vertice', position = (0, 0, 0), data = None):
         super().__init__(name = name, position = position, data = data)
-        
+        setting.run_or_defer(self._create, self)
+
+    def _create(self):
         bpy.ops.mesh.primitive_vert_add()
         bpy.context.object.name = self.name
 
         setting.set_object_mode("OBJECT")
-        self.move(position[0], position[1], position[2])
+        self.move(self.position[0], self.position[1], self.position[2])
 
 
 #=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
 #=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
 class Path_curve(Particle):
-    def __init__(self, name = 'path_curve', position = (0, 0, 0), data = None):
+    """Path curve. When points (an (N,3) array, e.g. a particle track) is given the
+       spline is built from it in one step, after dropping the points closer than
+       tolerance to the track (see decimate_track)
+     """
+    def __init__(self, name = 'path_curve', position = (0, 0, 0), points = None, tolerance = None, data = None):
         super().__init__(name = name, position = position, data = data)
         
         # bpy.ops.mesh.primitive_vert_add()
@@ -124,14 +160,30 @@ class Path_curve(Particle):
         # setting.set_object_mode("OBJECT")
         # self.move(position[0], position[1], position[2])
 
-        bpy.ops.curve.primitive_nurbs_path_add()
+        if points is None:
+            bpy.ops.curve.primitive_nurbs_path_add()
+            return
+
+        points = decimate_track(points, tolerance)
+        curve = bpy.data.curves.new(self.name, 'CURVE')
+        curve.dimensions = '3D'
+        spline = curve.splines.new('NURBS')
+        spline.points.add(len(points) - 1)
+        coordinates = np.ones((len(points), 4), dtype = np.float32)   # the 4th coordinate is the weight
+        coordinates[:, :3] = points
+        spline.points.foreach_set("co", coordinates.ravel())
+        spline.use_endpoint_u = True
+        _link_curve(self, curve)
 
 
 #=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
 #=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
 class Bezier_curve(Particle):
-    def __init__(self, name = 'bezier', position = (0, 0, 0), rotation = (0, 0, 0), scale = (1,1,1), data = None):
-        super().__init__(name = name, position = position, scale = scale, data = data)
+    """Bezier curve. When points (an (N,3) array) is given the curve passes through
+       them, with smooth handles computed from the neighbouring points
+     """
+    def __init__(self, name = 'bezier', position = (0, 0, 0), rotation = (0, 0, 0), scale = (1,1,1), points = None, tolerance = None, data = None):
+        super().__init__(name = name, position = position, rotation = rotation, scale = scale, data = data)
         
         # bpy.ops.mesh.primitive_vert_add()
         # bpy.context.object.name = self.name
@@ -139,27 +191,147 @@ class Bezier_curve(Particle):
         # setting.set_object_mode("OBJECT")
         # self.move(position[0], position[1], position[2])
     
-        bpy.ops.curve.primitive_bezier_curve_add()
+        if points is None:
+            bpy.ops.curve.primitive_bezier_curve_add()
+            return
+
+        points = decimate_track(points, tolerance).astype(np.float32)
+        tangents = np.gradient(points, axis = 0) / 3 if len(points) > 1 else np.zeros_like(points)
+        curve = bpy.data.curves.new(self.name, 'CURVE')
+        curve.dimensions = '3D'
+        spline = curve.splines.new('BEZIER')
+        spline.bezier_points.add(len(points) - 1)
+        spline.bezier_points.foreach_set("co", points.ravel())
+        spline.bezier_points.foreach_set("handle_left", (points - tangents).ravel())
+        spline.bezier_points.foreach_set("handle_right", (points + tangents).ravel())
+        _link_curve(self, curve, self.rotation, self.scale)
+
+
+
+def _link_curve(particle, curve, rotation = (0, 0, 0), scale = (1, 1, 1)):
+    obj = bpy.data.objects.new(particle.name, curve)
+    bpy.context.collection.objects.link(obj)
+    obj.location = particle.position
+    obj.rotation_euler = rotation
+    obj.scale = scale
+    particle.name = obj.name
+
+
+def decimate_track(points, tolerance = None):
+    """It simplifies a track with the Ramer-Douglas-Peucker algorithm, keeping only
+       the points farther than tolerance from the line between the kept ones
+       Parameters
+       ----------
+       points : array (N,3)
+       tolerance : float (None or 0 keeps every point)
+     """
+    points = np.asarray(points, dtype = np.float64).reshape(-1, 3)
+    if len(points) == 0:
+        raise ValueError("a track needs at least one point")
+    if not tolerance or len(points) < 3:
+        return points
+
+    keep = np.zeros(len(points), dtype = bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        inner = points[start + 1:end] - points[start]
+        length = np.linalg.norm(segment)
+        if length == 0:
+            distance = np.linalg.norm(inner, axis = 1)
+        else:
+            distance = np.linalg.norm(np.cross(inner, segment), axis = 1) / length
+        farthest = int(np.argmax(distance))
+        if distance[farthest] > tolerance:
+            farthest += start + 1
+            keep[farthest] = True
+            stack.append((start, farthest))
+            stack.append((farthest, end))
+    return points[keep]
 
 #=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
 #=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
 class Mesh(Particle):
-    def __init__(self, name = 'mesh', position = (0, 0, 0), rotation = (0, 0, 0), scale = (1,1,1), verts = [], edges = [], faces = [], data = None):
+    """Mesh built from vertex (V,3), edge (E,2) and face (F,k) arrays (lists of faces with
+       different sizes are accepted too). The geometry is written with foreach_set, and the
+       arrays are only kept on the particle (verts, edges, faces) when keep_data is True.
+       With append=True and an existing object called name, the geometry is added to its mesh
+     """
+    def __init__(self, name = 'mesh', position = (0, 0, 0), rotation = (0, 0, 0), scale = (1,1,1), verts = None, edges = None, faces = None,
+                 data = None, keep_data = False, append = False):
         super().__init__(name = name, position = position, rotation = rotation, scale = scale, data = data)
-        self.verts = verts 
-        self.edges = edges 
-        self.faces = faces
+        if keep_data:
+            self.verts = verts 
+            self.edges = edges 
+            self.faces = faces
 
         # verts = bpy.context.active_object.data.vertices
         # edges = bpy.context.active_object.data.edges
         # faces = bpy.context.active_object.data.polygons
 
-        mesh = bpy.data.meshes.new(self.name)
-        obj = bpy.data.objects.new(self.name, mesh)
-        col = bpy.data.collections.get("Collection")
-        col.objects.link(obj)
+        if append and self.name in bpy.data.objects:
+            obj = setting.get_object(self.name)
+        else:
+            mesh = bpy.data.meshes.new(self.name)
+            obj = bpy.data.objects.new(self.name, mesh)
+            col = bpy.data.collections.get("Collection") or bpy.context.scene.collection
+            col.objects.link(obj)
+            self.name = obj.name
         bpy.context.view_layer.objects.active = obj 
-        mesh.from_pydata(self.verts, self.edges, self.faces)
+        self.add_geometry(verts, edges, faces)
+
+    def add_geometry(self, verts = None, edges = None, faces = None):
+        """It appends vertices, edges and faces to the mesh. The indices of edges and faces
+           refer to the new vertices (0 is the first vertex of verts)
+         """
+        mesh = setting.get_object(self.name).data
+        offset = len(mesh.vertices)
+
+        verts = np.asarray(verts if verts is not None else np.zeros((0, 3)), dtype = np.float32).reshape(-1, 3)
+        mesh.vertices.add(len(verts))
+        mesh.vertices.foreach_set("co", _extend(mesh.vertices, "co", verts.ravel(), np.float32, 3))
+
+        if edges is not None and len(edges):
+            edges = np.asarray(edges, dtype = np.int32).reshape(-1, 2) + offset
+            mesh.edges.add(len(edges))
+            mesh.edges.foreach_set("vertices", _extend(mesh.edges, "vertices", edges.ravel(), np.int32, 2))
+
+        if faces is not None and len(faces):
+            try:
+                faces = np.asarray(faces, dtype = np.int32)
+                loops, sizes = faces.ravel(), np.full(len(faces), faces.shape[1], dtype = np.int32)
+            except ValueError:   # faces with different numbers of vertices
+                loops = np.concatenate([np.asarray(f, dtype = np.int32) for f in faces])
+                sizes = np.array([len(f) for f in faces], dtype = np.int32)
+            loop_offset = len(mesh.loops)
+            mesh.loops.add(len(loops))
+            mesh.loops.foreach_set("vertex_index", _extend(mesh.loops, "vertex_index", loops + offset, np.int32))
+
+            starts = loop_offset + np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int32)
+            mesh.polygons.add(len(sizes))
+            mesh.polygons.foreach_set("loop_start", _extend(mesh.polygons, "loop_start", starts, np.int32))
+            try:
+                mesh.polygons.foreach_set("loop_total", _extend(mesh.polygons, "loop_total", sizes, np.int32))
+            except (AttributeError, TypeError):   # read only since Blender 4.0, derived from loop_start
+                pass
+
+        mesh.update(calc_edges = faces is not None and len(faces) > 0)
+
+
+
+def _extend(collection, attribute, new_values, dtype, size = 1):
+    """It returns the flat values of attribute for the whole collection, whose last
+       elements were just added, with new_values written in place of those elements"""
+    values = np.empty(len(collection) * size, dtype = dtype)
+    old = len(values) - len(new_values)
+    if old:
+        collection.foreach_get(attribute, values)
+    values[old:] = new_values
+    return values
 
 
 
@@ -191,24 +363,258 @@ class Timer(Particle):
         bpy.context.object.data.align_y = 'CENTER'
         bpy.context.object.name = self.name
 
-        scene = bpy.context.scene
-        obj = scene.objects[self.name]
+        _timers[self.name] = self.frame
+        _register_timer_handler()
+        _update_timers(bpy.context.scene)
+
+    def unregister(self):
+        """It stops updating the text of this timer"""
+        _timers.pop(self.name, None)
+        if not _timers:
+            _unregister_timer_handler()
+
+
 
+# name of the text object -> frames per second, for all timers served by _update_timers
+_timers = {}
 
-        def recalculate_text(scene):
 
+@functools.lru_cache(maxsize = 4096)
+def _timer_text(frame_current, frame):
+    if 0 <= frame_current < 60*frame:
+        return str(int(frame_current/frame)) + 's'
+    min = int(frame_current/frame) // 60
+    return str(min) + 'min  ' + str(int(frame_current/frame)-60*min) + 's'
 
-            if scene.frame_current in range(0, 60*self.frame):
-                obj.data.body = str(int(bpy.context.scene.frame_current/self.frame)) + 's'
 
-            else:
-                min = int(bpy.context.scene.frame_current/self.frame) // 60
-                obj.data.body = str(min) + 'min  ' + str(int(bpy.context.scene.frame_current/self.frame)-60*min) + 's'
+@bpy.app.handlers.persistent
+def _update_timers(scene, *args):
+    """The only frame_change_post handler, it updates the text of every Timer"""
+    for name, frame in list(_timers.items()):
+        obj = scene.objects.get(name)
+        if obj is None or obj.type != 'FONT':
+            continue
+        text = _timer_text(scene.frame_current, frame)
+        if obj.data.body != text:
+            obj.data.body = text
 
-        bpy.app.handlers.frame_change_post.append(recalculate_text)
 
+def _unregister_timer_handler():
+    # compared by name so the handler of a previous import of this module is removed too
+    for handler in [h for h in bpy.app.handlers.frame_change_post if getattr(h, "__name__", None) == "_update_timers"]:
+        bpy.app.handlers.frame_change_post.remove(handler)
 
 
+def _register_timer_handler():
+    if _update_timers not in bpy.app.handlers.frame_change_post:
+        _unregister_timer_handler()
+        bpy.app.handlers.frame_change_post.append(_update_timers)
+
+
+@bpy.app.handlers.persistent
+def _forget_timers(*args):
+    """The timers belong to the file they were made in, so loading another file drops them"""
+    _timers.clear()
+    _unregister_timer_handler()
+
+
+for _handler in [h for h in bpy.app.handlers.load_post if getattr(h, "__name__", None) == "_forget_timers"]:
+    bpy.app.handlers.load_post.remove(_handler)
+bpy.app.handlers.load_post.append(_forget_timers)
+
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+class ParticleCloud(Particle):
+    """This class create many particles at once as a single object. Every row of positions
+       becomes one vertex of a mesh and a shared UV sphere is instanced on each vertex,
+       so N particles cost one object instead of N.
+       Parameters
+       ----------
+       name : string
+       positions : array (N,3)
+       scales : array (N,) or (N,3) (per particle scale, the sphere radius is multiplied by it)
+       data : dict of arrays or DataFrame with N rows (numeric columns are stored as point attributes)
+       radius : float (radius of the shared sphere)
+       segments, ring_count : int (resolution of the shared sphere)
+       instancing : string : 'NODES' (geometry nodes, supports per particle scale) or 'VERTS' (vertex instancing)
+     """
+
+    def __init__(self, name = 'particle_cloud', positions = None, scales = None, data = None, radius = 1, segments = 16, ring_count = 8,
+                 instancing = 'NODES', position = (0, 0, 0), rotation = (0, 0, 0), scale = (1, 1, 1)):
+        positions = np.ascontiguousarray(positions if positions is not None else np.zeros((0, 3)), dtype = np.float32).reshape(-1, 3)
+        self.count = len(positions)
+        self.segments = segments
+        self.ring_count = ring_count
+
+        mesh = bpy.data.meshes.new(name)
+        mesh.vertices.add(self.count)
+        mesh.vertices.foreach_set("co", positions.ravel())
+
+        if scales is None:
+            scales = np.ones(self.count, dtype = np.float32)
+        scales = np.asarray(scales, dtype = np.float32)
+        if scales.ndim == 1:
+            scales = np.repeat(scales[:, None], 3, axis = 1)
+        scales = np.ascontiguousarray(scales * radius, dtype = np.float32)
+        mesh.attributes.new("scale", 'FLOAT_VECTOR', 'POINT').data.foreach_set("vector", scales.ravel())
+
+        if data is not None:
+            for column in (data.columns if isinstance(data, pd.DataFrame) else data.keys()):
+                values = np.asarray(data[column])
+                if values.shape == (self.count,) and np.issubdtype(values.dtype, np.number):
+                    mesh.attributes.new(str(column), 'FLOAT', 'POINT').data.foreach_set("value", values.astype(np.float32))
+        mesh.update()
+
+        obj = bpy.data.objects.new(name, mesh)
+        bpy.context.collection.objects.link(obj)
+        obj.location = position
+        obj.rotation_euler = rotation
+        obj.scale = scale
+
+        if instancing == 'VERTS':
+            sphere = bpy.data.objects.new(name + "_instance", _instance_sphere_mesh(segments, ring_count, radius))
+            bpy.context.collection.objects.link(sphere)
+            sphere.parent = obj
+            obj.instance_type = 'VERTS'
+        else:
+            modifier = obj.modifiers.new("Instances", 'NODES')
+            modifier.node_group = _instance_node_group(segments, ring_count)
+
+        super().__init__(name = obj.name, position = position, rotation = rotation, scale = scale, data = data)
+
+
+
+def _instance_sphere_mesh(segments, ring_count, radius):
+    """It returns the shared sphere mesh used by vertex instancing, creating it only once"""
+    name = "bs_instance_sphere_%dx%d_%g" % (segments, ring_count, radius)
+    mesh = bpy.data.meshes.get(name)
+    if mesh is None:
+        import bmesh
+        mesh = bpy.data.meshes.new(name)
+        bm = bmesh.new()
+        bmesh.ops.create_uvsphere(bm, u_segments = segments, v_segments = ring_count, radius = radius)
+        bm.to_mesh(mesh)
+        bm.free()
+    return mesh
+
+
+def _instance_node_group(segments, ring_count, material = None):
+    """It returns the geometry nodes group that instances a sphere on every point scaled by the 'scale' attribute.
+       The generated sphere has no material of its own, so the one given here is set on it (one group per material)"""
+    name = "bs_particle_cloud_%dx%d" % (segments, ring_count) + ("_" + material.name if material is not None else "")
+    group = bpy.data.node_groups.get(name)
+    if group is not None:
+        return group
+
+    group = bpy.data.node_groups.new(name, 'GeometryNodeTree')
+    if hasattr(group, "interface"):
+        group.interface.new_socket(name = "Geometry", in_out = 'INPUT', socket_type = 'NodeSocketGeometry')
+        group.interface.new_socket(name = "Geometry", in_out = 'OUTPUT', socket_type = 'NodeSocketGeometry')
+    else:
+        group.inputs.new('NodeSocketGeometry', "Geometry")
+        group.outputs.new('NodeSocketGeometry', "Geometry")
+
+    nodes = group.nodes
+    group_input = nodes.new('NodeGroupInput')
+    group_output = nodes.new('NodeGroupOutput')
+    sphere = nodes.new('GeometryNodeMeshUVSphere')
+    sphere.inputs["Segments"].default_value = segments
+    sphere.inputs["Rings"].default_value = ring_count
+    sphere.inputs["Radius"].default_value = 1
+    set_material = nodes.new('GeometryNodeSetMaterial')
+    set_material.inputs["Material"].default_value = material
+    scale = nodes.new('GeometryNodeInputNamedAttribute')
+    scale.data_type = 'FLOAT_VECTOR'
+    scale.inputs["Name"].default_value = "scale"
+    instance = nodes.new('GeometryNodeInstanceOnPoints')
+
+    group.links.new(group_input.outputs[0], instance.inputs["Points"])
+    group.links.new(sphere.outputs["Mesh"], set_material.inputs["Geometry"])
+    group.links.new(set_material.outputs["Geometry"], instance.inputs["Instance"])
+    group.links.new(scale.outputs["Attribute"], instance.inputs["Scale"])
+    group.links.new(instance.outputs["Instances"], group_output.inputs[0])
+    return group
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Level of detail of the spheres
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# (minimum projected size, segments, ring_count), from the finest to the coarsest level
+SPHERE_LOD_LEVELS = ((2.0, 32, 16), (0.5, 16, 8), (0.0, 8, 4))
+
+
+def apply_sphere_lod(camera = None, names = None, levels = SPHERE_LOD_LEVELS):
+    """It gives every Sphere the mesh resolution matching its size seen from the camera.
+       The projected size is scale * focal_length / distance (a Sphere has radius 1), and the
+       meshes of each level are created once and shared by all spheres. The materials of a
+       sphere are moved to its object slots, and the mesh it had is removed when unused.
+       Editing the mesh of one sphere afterwards (set_vertices_array, apply_shade_smooth,
+       create_skin) first gives it its own copy (setting.make_single_user), and a later call
+       replaces that copy again unless the sphere is left out of names
+       Parameters
+       ----------
+       camera : string (name of the camera, defaults to the scene camera)
+       names : list (names of the spheres, defaults to all the Sphere objects)
+       levels : tuple of (minimum projected size, segments, ring_count), finest first
+     """
+    camera = setting.get_object(camera) if camera is not None else bpy.context.scene.camera
+    if camera is None:
+        return
+    objects = [setting.get_object(n) for n in names] if names is not None else [o for o in bpy.data.objects if o.get("bs_sphere")]
+    if not objects:
+        return
+
+    locations = np.array([o.matrix_world.translation for o in objects], dtype = np.float64)
+    scales = np.array([max(o.matrix_world.to_scale()) for o in objects], dtype = np.float64)
+    distance = np.maximum(np.linalg.norm(locations - np.array(camera.matrix_world.translation), axis = 1), 1e-6)
+    size = scales * camera.data.lens / distance
+
+    thresholds = np.array([level[0] for level in levels])
+    fits = size[:, None] >= thresholds[None, :]
+    # the finest level whose minimum size is reached, or the coarsest one when none is
+    chosen = np.where(fits.any(axis = 1), np.argmax(fits, axis = 1), len(levels) - 1)
+    meshes = [_instance_sphere_mesh(segments, ring_count, 1) for _, segments, ring_count in levels]
+    for obj, level in zip(objects, chosen):
+        old, mesh = obj.data, meshes[level]
+        if old == mesh:
+            continue
+        materials = list(old.materials)
+        while len(mesh.materials) < len(materials):
+            mesh.materials.append(None)
+        obj.data = mesh
+        for slot, material in zip(obj.material_slots, materials):
+            if material is not None:
+                slot.link = 'OBJECT'
+                slot.material = material
+        if old.users == 0 and old not in meshes:
+            bpy.data.meshes.remove(old)
+
+
+_lod_settings = {}
+
+
+@bpy.app.handlers.persistent
+def _update_sphere_lod(scene, *args):
+    apply_sphere_lod(**_lod_settings)
+
+
+def sphere_lod_per_frame(enable = True, camera = None, names = None, levels = SPHERE_LOD_LEVELS):
+    """It recomputes apply_sphere_lod on every frame change (for moving cameras), or stops it"""
+    for handler in [h for h in bpy.app.handlers.frame_change_post if getattr(h, "__name__", None) == "_update_sphere_lod"]:
+        bpy.app.handlers.frame_change_post.remove(handler)
+    _lod_settings.clear()
+    if enable:
+        _lod_settings.update(camera = camera, names = names, levels = levels)
+        bpy.app.handlers.frame_change_post.append(_update_sphere_lod)
+
+
+
+profiling.enable_from_environment()
+
 
 if __name__ == "__main__":
     m = Mesh(verts = ((0,1,0),(1,0,0),(0,0,1),(-1,0,0)), edges = ([0,1],[1,2],[0,2],[0,3],[2,3]), faces = ([0,1,2],[2,0,3]))
@@ -0,0 +1,154 @@
+import bpy
+import numpy as np
+from . import setting
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Colormaps
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# evenly spaced RGB stops, linearly interpolated
+COLORMAPS = {
+    "viridis": ((0.267, 0.005, 0.329), (0.229, 0.322, 0.546), (0.128, 0.567, 0.551), (0.369, 0.789, 0.383), (0.993, 0.906, 0.144)),
+    "plasma": ((0.050, 0.030, 0.528), (0.494, 0.012, 0.658), (0.798, 0.280, 0.470), (0.973, 0.585, 0.252), (0.940, 0.975, 0.131)),
+    "coolwarm": ((0.230, 0.299, 0.754), (0.552, 0.690, 0.996), (0.865, 0.865, 0.865), (0.958, 0.604, 0.483), (0.706, 0.016, 0.150)),
+    "gray": ((0, 0, 0), (1, 1, 1)),
+}
+
+
+def colormap(values, cmap = "viridis", vmin = None, vmax = None):
+    """ It maps values to colors
+
+    Args:
+        values (array): (N,) values
+        cmap (str, optional): one of COLORMAPS, or a matplotlib colormap name if matplotlib is installed. Defaults to "viridis".
+        vmin, vmax (float, optional): values mapped to the ends of the colormap. Default to the minimum and maximum.
+
+    Returns:
+        array: (N, 4) float32 RGBA colors
+    """
+    values = np.asarray(values, dtype = np.float64).reshape(-1)
+    vmin = np.nanmin(values) if vmin is None else vmin
+    vmax = np.nanmax(values) if vmax is None else vmax
+    t = np.clip((values - vmin) / ((vmax - vmin) or 1), 0, 1)
+
+    colors = np.ones((len(values), 4), dtype = np.float32)
+    if cmap in COLORMAPS:
+        stops = np.asarray(COLORMAPS[cmap])
+        positions = np.linspace(0, 1, len(stops))
+        for channel in range(3):
+            colors[:, channel] = np.interp(t, positions, stops[:, channel])
+    else:
+        import matplotlib
+        colors[:] = matplotlib.colormaps[cmap](t)
+    return colors
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Coloring particles with one shared material
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+def shared_material(attribute = "bs_color", source = 'GEOMETRY'):
+    """ It returns the material whose base color is read from a color attribute, creating it once
+
+    Args:
+        attribute (str, optional): name of the color attribute. Defaults to "bs_color".
+        source (str, optional): 'GEOMETRY' (attribute of the mesh), 'INSTANCER' (attribute of the
+            points the object is instanced on, for ParticleCloud) or 'OBJECT' (the color of each object)
+    """
+    name = "bs_%s_%s" % (attribute, source.lower())
+    material = bpy.data.materials.get(name)
+    if material is not None:
+        return material
+
+    material = bpy.data.materials.new(name)
+    material.use_nodes = True
+    nodes = material.node_tree.nodes
+    shader = nodes.get("Principled BSDF") or nodes.new("ShaderNodeBsdfPrincipled")
+    if source == 'OBJECT':
+        color = nodes.new("ShaderNodeObjectInfo").outputs["Color"]
+    else:
+        node = nodes.new("ShaderNodeAttribute")
+        node.attribute_name = attribute
+        node.attribute_type = source
+        color = node.outputs["Color"]
+    material.node_tree.links.new(color, shader.inputs["Base Color"])
+    return material
+
+
+def _assign(mesh, material, obj = None):
+    # the faces use the first slot, so a material appended after an existing one would not show
+    if len(mesh.materials):
+        mesh.materials[0] = material
+    else:
+        mesh.materials.append(material)
+    # a slot linked to the object (e.g. by apply_sphere_lod) overrides the mesh material
+    if obj is not None and len(obj.material_slots) and obj.material_slots[0].link == 'OBJECT':
+        obj.material_slots[0].material = material
+
+
+def color_by(particles, values = None, column = None, cmap = "viridis", vmin = None, vmax = None, attribute = "bs_color"):
+    """ It colors particles by a data column or an array, with a single shared material
+
+    A ParticleCloud or a Mesh gets a color attribute written in one foreach_set (per point, or
+    per face when there is one value per polygon). A list of particles gets one object color
+    each, read by the material through its Object Info node, so no datablock is created per particle.
+    A ParticleCloud has to use instancing='NODES': the material is set on the spheres by its
+    geometry nodes, while with vertex instancing the spheres are a separate object that cannot
+    read the points' attribute.
+
+    Args:
+        particles (Particle or list): a ParticleCloud/Mesh, or a list of particles
+        values (array, optional): one value per point, face or particle
+        column (str, optional): take the values from particle.data[column] instead
+        cmap, vmin, vmax: see colormap
+        attribute (str, optional): name of the color attribute. Defaults to "bs_color".
+
+    Returns:
+        the shared material
+    """
+    from . import Particle, ParticleCloud, _instance_node_group
+
+    if isinstance(particles, Particle):
+        obj = setting.get_object(particles.name)
+        if isinstance(particles, ParticleCloud) and obj.instance_type == 'VERTS':
+            raise ValueError("%s uses vertex instancing, color_by needs a ParticleCloud with instancing='NODES'" % particles.name)
+        if values is None:
+            values = particles.data[column]
+        colors = colormap(values, cmap, vmin, vmax)
+        mesh = obj.data
+        if len(colors) not in (len(mesh.vertices), len(mesh.polygons)):
+            raise ValueError("%s has %d vertices and %d faces, got %d values (color several particles with a list)"
+                             % (particles.name, len(mesh.vertices), len(mesh.polygons), len(colors)))
+        domain = 'FACE' if len(colors) == len(mesh.polygons) and len(colors) != len(mesh.vertices) else 'POINT'
+
+        color_attribute = mesh.attributes.get(attribute)
+        if color_attribute is not None and (color_attribute.domain != domain or color_attribute.data_type != 'FLOAT_COLOR'):
+            mesh.attributes.remove(color_attribute)
+            color_attribute = None
+        if color_attribute is None:
+            color_attribute = mesh.attributes.new(attribute, 'FLOAT_COLOR', domain)
+        color_attribute.data.foreach_set("color", colors.ravel())
+        mesh.update()
+
+        if isinstance(particles, ParticleCloud):
+            # the spheres are made by the geometry nodes, which set their material
+            material = shared_material(attribute, 'INSTANCER')
+            obj.modifiers["Instances"].node_group = _instance_node_group(particles.segments, particles.ring_count, material)
+            return material
+
+        material = shared_material(attribute, 'GEOMETRY')
+        _assign(mesh, material, obj)
+        return material
+
+    particles = list(particles)
+    if values is None:
+        values = [p.data[column] for p in particles]
+    colors = colormap(values, cmap, vmin, vmax)
+    if len(colors) != len(particles):
+        raise ValueError("got %d values for %d particles" % (len(colors), len(particles)))
+    material = shared_material(attribute, 'OBJECT')
+    for particle, color in zip(particles, colors):
+        obj = setting.get_object(particle.name)
+        obj.color = color
+        if obj.data is not None and hasattr(obj.data, "materials"):
+            _assign(obj.data, material, obj)
+    return material
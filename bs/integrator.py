@@ -0,0 +1,112 @@
+import itertools
+import numpy as np
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Charged particle tracks in a magnetic field
+#
+# Units: positions in m, momenta in GeV/c, masses in GeV/c^2, charges in e, field in T and
+# time in ns. With them a track of momentum p bends with radius p / (0.3 q B).
+#
+# The tracks come out as (N, T, 3) arrays that can go straight to the curves and keyframes:
+#     tracks = integrate(positions, momenta, charges, field = (0, 0, 2), dt = 0.01, steps = 500)
+#     bs.Path_curve(points = tracks[i], tolerance = 1e-3)
+#     bs.setting.put_keyframes_array(names, np.arange(tracks.shape[1]), tracks)
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+SPEED_OF_LIGHT = 0.299792458     # m/ns, also the factor of q * v x B in GeV/c per m T
+PION_MASS = 0.13957
+
+
+def tabulated_field(values, lower, upper):
+    """ It returns a field function interpolating (trilinearly) values given on a regular grid.
+    The field is zero outside the grid
+
+    Args:
+        values (array): (nx, ny, nz, 3) field at the grid nodes, each n at least 2
+        lower, upper (array): (3,) corners of the grid
+    """
+    values = np.asarray(values, dtype = np.float64)
+    lower = np.asarray(lower, dtype = np.float64)
+    upper = np.asarray(upper, dtype = np.float64)
+    shape = np.array(values.shape[:3])
+
+    def field(positions):
+        grid = (positions - lower) / (upper - lower) * (shape - 1)
+        inside = np.all((grid >= 0) & (grid <= shape - 1), axis = 1)
+        index = np.clip(np.floor(grid).astype(np.int64), 0, shape - 2)
+        fraction = np.clip(grid - index, 0, 1)
+
+        result = np.zeros((len(positions), 3))
+        for corner in itertools.product((0, 1), repeat = 3):
+            weight = np.prod(np.where(corner, fraction, 1 - fraction), axis = 1)
+            result += weight[:, None] * values[index[:, 0] + corner[0], index[:, 1] + corner[1], index[:, 2] + corner[2]]
+        result[~inside] = 0
+        return result
+    return field
+
+
+def _push(positions, momenta, charges, masses, field, dt, steps, record_every, out):
+    x = np.array(positions, dtype = np.float64)
+    p = np.array(momenta, dtype = np.float64)
+    energy = np.sqrt(np.einsum("ij,ij->i", p, p) + masses**2)
+    # the magnetic field does not change |p|, so the rotation factor only depends on the field
+    factor = (charges * SPEED_OF_LIGHT**2 * dt / (2 * energy))[:, None]
+    velocity = (SPEED_OF_LIGHT * dt / energy)[:, None]
+
+    out[:, 0] = x
+    for step in range(1, steps + 1):
+        b = field(x) if callable(field) else field
+        t = factor * b
+        s = 2 * t / (1 + np.einsum("ij,ij->i", t, t))[:, None]
+        p_prime = p + np.cross(p, t)
+        p = p + np.cross(p_prime, s)
+        x += velocity * p
+        if step % record_every == 0:
+            out[:, step // record_every] = x
+
+
+def integrate_chunks(positions, momenta, charges, masses = PION_MASS, field = (0, 0, 2), dt = 0.01, steps = 1000,
+                     record_every = 1, chunk_size = 100000):
+    """ It integrates the tracks with the Boris pusher, chunk_size particles at a time
+
+    Args:
+        positions (array): (N, 3) starting points
+        momenta (array): (N, 3) starting momenta
+        charges (array): (N,) charges, 0 gives straight lines
+        masses (float or array, optional): (N,) masses. Defaults to the pion mass.
+        field (array or function, optional): a uniform (3,) field, or a function from (M, 3)
+            positions to (M, 3) fields such as tabulated_field. Defaults to 2 T along z.
+        dt (float, optional): time step. Defaults to 0.01 ns.
+        steps (int, optional): number of steps. Defaults to 1000.
+        record_every (int, optional): only every record_every-th step is returned. Defaults to 1.
+        chunk_size (int, optional): particles integrated together. Defaults to 100000.
+
+    Yields:
+        (slice, array): the particles of the chunk and their (n, T, 3) tracks, T = steps // record_every + 1
+    """
+    positions = np.asarray(positions, dtype = np.float64).reshape(-1, 3)
+    momenta = np.asarray(momenta, dtype = np.float64).reshape(-1, 3)
+    charges = np.broadcast_to(np.asarray(charges, dtype = np.float64), len(positions))
+    masses = np.broadcast_to(np.asarray(masses, dtype = np.float64), len(positions))
+    if not callable(field):
+        field = np.asarray(field, dtype = np.float64)
+
+    for start in range(0, len(positions), chunk_size):
+        chunk = slice(start, min(start + chunk_size, len(positions)))
+        tracks = np.empty((chunk.stop - chunk.start, steps // record_every + 1, 3), dtype = np.float32)
+        _push(positions[chunk], momenta[chunk], charges[chunk], masses[chunk], field, dt, steps, record_every, tracks)
+        yield chunk, tracks
+
+
+def integrate(positions, momenta, charges, masses = PION_MASS, field = (0, 0, 2), dt = 0.01, steps = 1000,
+              record_every = 1, chunk_size = 100000, out = None):
+    """ It returns the (N, T, 3) float32 tracks of all the particles, see integrate_chunks
+
+    Args:
+        out (array, optional): where to write the tracks, e.g. a np.memmap when they do not fit in memory
+    """
+    n = len(np.asarray(positions).reshape(-1, 3))
+    if out is None:
+        out = np.empty((n, steps // record_every + 1, 3), dtype = np.float32)
+    for chunk, tracks in integrate_chunks(positions, momenta, charges, masses, field, dt, steps, record_every, chunk_size):
+        out[chunk] = tracks
+    return out
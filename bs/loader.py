@@ -0,0 +1,97 @@
+import bpy
+import os
+import sqlite3
+import pandas as pd
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Reading event data in chunks
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+def _quote(identifier):
+    """An SQL identifier (table or column name) quoted so that it cannot end the query text"""
+    return '"%s"' % str(identifier).replace('"', '""')
+
+
+def read_chunks(source, table = None, chunksize = 10000, columns = None):
+    """ It reads an SQLite table or a CSV/Parquet file lazily, one DataFrame of at most
+    chunksize rows at a time, so the whole file never has to be in memory
+
+    Args:
+        source (str): path of a .db/.sqlite, .csv or .parquet file
+        table (str, optional): the table to read when source is an SQLite database
+        chunksize (int, optional): number of rows per chunk. Defaults to 10000.
+        columns (list, optional): only these columns are read. Defaults to all of them.
+    """
+    extension = os.path.splitext(source)[1].lower()
+
+    if extension in (".db", ".sqlite", ".sqlite3"):
+        if table is None:
+            raise ValueError("a table name is needed to read from %s" % source)
+        selection = ", ".join(_quote(c) for c in columns) if columns else "*"
+        connection = sqlite3.connect(source)
+        try:
+            for chunk in pd.read_sql_query("SELECT %s FROM %s" % (selection, _quote(table)), connection, chunksize = chunksize):
+                yield chunk
+        finally:
+            connection.close()
+
+    elif extension == ".csv":
+        for chunk in pd.read_csv(source, usecols = columns, chunksize = chunksize):
+            yield chunk
+
+    elif extension == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size = chunksize, columns = columns):
+            yield batch.to_pandas()
+
+    else:
+        raise ValueError("unsupported file format: %s" % source)
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Creating particles from the chunks
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+def stream_particles(chunks, name = "name", position = ("x", "y", "z"), factory = None):
+    """ It creates or updates one particle per row, chunk by chunk
+
+    Args:
+        chunks (iterable): DataFrames, e.g. the output of read_chunks
+        name (str, optional): column with the name of the particle. Defaults to "name".
+        position (tuple, optional): columns with the coordinates. Defaults to ("x", "y", "z").
+        factory (class, optional): Particle class used for new particles. Defaults to Sphere.
+
+    Yields:
+        the particle of every row, with the row (as a dict) in particle.data
+    """
+    from . import Particle, Sphere
+    factory = factory or Sphere
+
+    for chunk in chunks:
+        for row in chunk.to_dict("records"):
+            coordinates = tuple(float(row[c]) for c in position)
+            if row[name] in bpy.data.objects:
+                particle = Particle(name = row[name], data = row)
+                particle.move(*coordinates)
+            else:
+                particle = factory(name = row[name], position = coordinates, data = row)
+            yield particle
+
+
+def load_particles(source, table = None, chunksize = 10000, columns = None, name = "name", position = ("x", "y", "z"), factory = None):
+    """ It loads the particles of an SQLite table or a CSV/Parquet file with bounded memory
+
+    Args:
+        source, table, chunksize, columns: see read_chunks
+        name, position, factory: see stream_particles
+
+    Returns:
+        int: the number of particles created or updated
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + [name] + list(position)))
+    chunks = read_chunks(source, table = table, chunksize = chunksize, columns = columns)
+
+    count = 0
+    for _ in stream_particles(chunks, name = name, position = position, factory = factory):
+        count += 1
+    return count
@@ -0,0 +1,160 @@
+import bpy
+import atexit
+import csv
+import functools
+import json
+import os
+import sys
+import time
+import types
+import numpy as np
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Opt-in instrumentation of the bs and bs.setting entry points
+#
+# Nothing is wrapped until enable() is called (or the BS_PROFILE environment variable is set
+# before importing bs), so there is no overhead at all when it is off. When it is on, every
+# public function of bs.setting and every public method of the bs classes records its number
+# of calls, its latencies and the number of bpy.ops calls made inside it (like the latencies,
+# the counts include the instrumented functions it calls)
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+_stats = {}         # qualified name -> {"latencies": [...], "ops": int}
+_stack = []         # names of the instrumented functions being run, innermost last
+_originals = []     # (owner, attribute, original) to undo enable()
+_ops_total = [0]
+# helpers that every entry point goes through, their rows would only repeat the callers' ones
+_PLUMBING = {"get_object", "get_collection", "invalidate_index", "run_or_defer", "set_attribute"}
+
+
+class _CountingOps():
+    """Stand-in for bpy.ops that counts each operator call"""
+
+    def __init__(self, ops):
+        self._ops = ops
+
+    def __getattr__(self, name):
+        return _CountingOps(getattr(self._ops, name))
+
+    def __call__(self, *args, **kwargs):
+        _ops_total[0] += 1
+        for name in set(_stack):   # a recursive call is counted once
+            _stats[name]["ops"] += 1
+        return self._ops(*args, **kwargs)
+
+
+class _CountingBpy(types.ModuleType):
+    """Stand-in for the bpy module seen by bs while profiling, only ops differs"""
+
+    def __init__(self):
+        super().__init__("bpy")
+        self.ops = _CountingOps(bpy.ops)
+
+    def __getattr__(self, name):
+        return getattr(bpy, name)
+
+
+def _instrument(name, function):
+    _stats.setdefault(name, {"latencies": [], "ops": 0})
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        _stack.append(name)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _stats[name]["latencies"].append(time.perf_counter() - start)
+            _stack.pop()
+    return wrapper
+
+
+def _replace(owner, attribute, name):
+    original = owner.__dict__[attribute]
+    _originals.append((owner, attribute, original))
+    setattr(owner, attribute, _instrument(name, original))
+
+
+def _modules():
+    package = sys.modules[__package__]
+    return [package, package.setting]
+
+
+def enable():
+    """It starts recording. Calling it twice has no effect"""
+    if _originals:
+        return
+    for module in _modules():
+        for attribute, value in list(vars(module).items()):
+            if getattr(value, "__module__", None) != module.__name__:
+                continue
+            if isinstance(value, types.FunctionType) and not attribute.startswith("_") and attribute not in _PLUMBING:
+                _replace(module, attribute, "%s.%s" % (module.__name__, attribute))
+            elif isinstance(value, type):
+                for method, function in list(vars(value).items()):
+                    if isinstance(function, types.FunctionType) and (method == "__init__" or not method.startswith("_")):
+                        _replace(value, method, "%s.%s.%s" % (module.__name__, attribute, method))
+        _originals.append((module, "bpy", module.bpy))
+        module.bpy = _CountingBpy()
+
+
+def disable():
+    """It stops recording and puts the original functions back. The results are kept"""
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+
+
+def reset():
+    """It discards the results recorded so far"""
+    for stats in _stats.values():
+        stats["latencies"] = []
+        stats["ops"] = 0
+    _ops_total[0] = 0
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Results
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+def report():
+    """ It returns the results, one row per function that was called, slowest first
+
+    Returns:
+        list of dict: name, calls, total, mean, p50, p90, p99 (seconds, total includes the
+        instrumented functions called inside) and ops (bpy.ops calls made inside, counted the same way)
+    """
+    rows = []
+    for name, stats in _stats.items():
+        if not stats["latencies"]:
+            continue
+        latencies = np.array(stats["latencies"])
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        rows.append({"name": name, "calls": len(latencies), "total": float(latencies.sum()), "mean": float(latencies.mean()),
+                     "p50": float(p50), "p90": float(p90), "p99": float(p99), "ops": stats["ops"]})
+    return sorted(rows, key = lambda row: row["total"], reverse = True)
+
+
+def export(path):
+    """ It writes report() to a .json or .csv file
+
+    Args:
+        path (str): the extension chooses the format
+    """
+    rows = report()
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline = "") as f:
+            writer = csv.DictWriter(f, fieldnames = ["name", "calls", "total", "mean", "p50", "p90", "p99", "ops"])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w") as f:
+            json.dump({"ops_total": _ops_total[0], "functions": rows}, f, indent = 2)
+
+
+def enable_from_environment():
+    """BS_PROFILE=1 enables the profiling when bs is imported, and BS_PROFILE_OUTPUT=path
+    exports the results there when the process ends"""
+    if os.environ.get("BS_PROFILE", "") not in ("", "0"):
+        enable()
+        if os.environ.get("BS_PROFILE_OUTPUT"):
+            atexit.register(export, os.environ["BS_PROFILE_OUTPUT"])
@@ -0,0 +1,113 @@
+import bpy
+import glob
+import math
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Rendering a frame range with a pool of background Blender processes
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+def _output_pattern(output, blend_file):
+    """The output path as Blender understands it: '//' is the folder of the .blend file
+    and, without '#', the frame number is appended with 4 digits"""
+    if output.startswith("//"):
+        output = os.path.join(os.path.dirname(os.path.abspath(blend_file)), output[2:])
+    if "#" not in os.path.basename(output):
+        output += "####"
+    return os.path.abspath(output)
+
+
+def _frame_file(pattern, frame):
+    """It returns the file rendered for frame, or None if there is none"""
+    digits = pattern.count("#")
+    stem = pattern.replace("#" * digits, str(frame).zfill(digits), 1) if "#" * digits in pattern else pattern
+    files = sorted(glob.glob(glob.escape(stem) + ".*")) + ([stem] if os.path.isfile(stem) else [])
+    return files[0] if files else None
+
+
+def _render_chunk(blender, blend_file, pattern, chunk, extra_args, timeout):
+    command = list(blender) + ["-b", blend_file, "-o", pattern, "-s", str(chunk[0]), "-e", str(chunk[1])] + list(extra_args) + ["-a"]
+    try:
+        result = subprocess.run(command, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL, timeout = timeout)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return result.returncode == 0 and all(_frame_file(pattern, f) for f in range(chunk[0], chunk[1] + 1))
+
+
+def render_frames(blend_file, output, frame_start, frame_end, workers = None, chunk_size = None, blender = "blender",
+                  retries = 2, extra_args = (), timeout = None):
+    """ It renders frame_start..frame_end of a saved .blend file, splitting the range into
+    chunks that are rendered by `workers` background Blender processes at the same time
+
+    Args:
+        blend_file (str): the scene to render
+        output (str): output path, as given to blender -o (e.g. "//render/frame_####")
+        frame_start, frame_end (int): the range, both included
+        workers (int, optional): number of processes. Defaults to the number of cores.
+        chunk_size (int, optional): frames per process. Defaults to two chunks per worker.
+        blender (str or list, optional): the Blender executable, a list to pass a command
+            with arguments (e.g. [sys.executable, "stand_in.py"]). Defaults to "blender".
+        retries (int, optional): times a failed chunk is rendered again. Defaults to 2.
+        extra_args (list, optional): given to Blender before -a, e.g. ["-E", "BLENDER_EEVEE"]
+        timeout (float, optional): seconds after which a process is considered failed
+
+    Returns:
+        list: the rendered files, in frame order
+    """
+    blender = [blender] if isinstance(blender, str) else list(blender)
+    workers = workers or os.cpu_count() or 1
+    frames = frame_end - frame_start + 1
+    chunk_size = chunk_size or max(1, math.ceil(frames / (2 * workers)))
+    chunks = [(s, min(s + chunk_size - 1, frame_end)) for s in range(frame_start, frame_end + 1, chunk_size)]
+    pattern = _output_pattern(output, blend_file)
+    os.makedirs(os.path.dirname(pattern), exist_ok = True)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        running = {pool.submit(_render_chunk, blender, blend_file, pattern, chunk, extra_args, timeout): (chunk, 0) for chunk in chunks}
+        while running:
+            done, _ = wait(running, return_when = FIRST_COMPLETED)
+            for future in done:
+                chunk, attempt = running.pop(future)
+                if future.result():
+                    continue
+                if attempt < retries:
+                    running[pool.submit(_render_chunk, blender, blend_file, pattern, chunk, extra_args, timeout)] = (chunk, attempt + 1)
+                else:
+                    failed.append(chunk)
+
+    if failed:
+        raise RuntimeError("frames %s failed after %d attempts" % (", ".join("%d-%d" % c for c in sorted(failed)), retries + 1))
+    return [_frame_file(pattern, f) for f in range(frame_start, frame_end + 1)]
+
+
+def render_animation(output, frame_start = None, frame_end = None, workers = None, chunk_size = None, blender = None,
+                     retries = 2, extra_args = (), timeout = None):
+    """ It saves a copy of the current scene once and renders it with render_frames
+
+    Args:
+        output (str): output path, e.g. "/tmp/render/frame_####"
+        frame_start, frame_end (int, optional): Default to the frame range of the scene.
+        blender (str or list, optional): Defaults to the running Blender executable.
+        the other arguments are the ones of render_frames
+
+    Returns:
+        list: the rendered files, in frame order
+    """
+    scene = bpy.context.scene
+    if output.startswith("//"):
+        if not bpy.data.filepath:
+            raise ValueError("the output %s is relative to the .blend file, which is not saved" % output)
+        output = os.path.join(os.path.dirname(bpy.data.filepath), output[2:])
+
+    # the copy is deleted once the frames are rendered
+    with tempfile.TemporaryDirectory(prefix = "bs_render_") as folder:
+        blend_file = os.path.join(folder, "scene.blend")
+        bpy.ops.wm.save_as_mainfile(filepath = blend_file, copy = True)
+        return render_frames(blend_file, output,
+                             scene.frame_start if frame_start is None else frame_start,
+                             scene.frame_end if frame_end is None else frame_end,
+                             workers = workers, chunk_size = chunk_size, blender = blender or bpy.app.binary_path,
+                             retries = retries, extra_args = extra_args, timeout = timeout)
@@ -1,4 +1,184 @@
 import bpy
+import contextlib
+import numpy as np
+from mathutils import Matrix
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Name -> object and name -> collection index
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+_objects_index = {}
+_collections_index = {}
+
+
+def _lookup(index, name, datablocks):
+    item = index.get(name)
+    if item is not None:
+        try:
+            if item.name == name:
+                return item
+        except ReferenceError:   # the datablock was removed since it was cached
+            pass
+    item = datablocks.get(name)
+    if item is None:
+        index.pop(name, None)
+        raise KeyError(name)
+    index[name] = item
+    return item
+
+
+def get_object(name):
+    """ It returns bpy.data.objects[name] through a cache. Stale entries (renamed or
+    removed objects) are detected on access and looked up again
+
+    Args:
+        name (str): name of the object
+    """
+    return _lookup(_objects_index, name, bpy.data.objects)
+
+
+def get_collection(name):
+    """ It returns bpy.data.collections[name] through a cache, like get_object
+
+    Args:
+        name (str): name of the collection
+    """
+    return _lookup(_collections_index, name, bpy.data.collections)
+
+
+def invalidate_index(*args):
+    """ It empties the object and collection caches. It is called automatically after
+    loading a file or undoing, since the cached references are not valid anymore
+    """
+    _objects_index.clear()
+    _collections_index.clear()
+
+
+for _handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+    for _handler in [h for h in _handlers if getattr(h, "__name__", None) == "invalidate_index"]:
+        _handlers.remove(_handler)
+    _handlers.append(bpy.app.handlers.persistent(invalidate_index))
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Deferred scene building
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+class Batch():
+    """This class records the scene edits made inside "with batch():" and applies them
+       grouped by kind when the block ends, with a single view layer update.
+       Only the last value written to the same property of the same object is applied.
+       Attributes
+       ----------
+       recorded : int : (number of edits made inside the block)
+       applied : int : (number of writes done to Blender when the block ended)
+       coalesced : int : (recorded - applied)
+     """
+
+    def __init__(self):
+        self.created = []            # functions creating the objects, in order
+        self.transforms = {}         # (object name, attribute) -> value
+        self.initial = {}            # (object name, attribute) -> value given to a particle created in the batch
+        self.collections = {}        # object name -> collection name
+        self.deselect_all = False
+        self.selection = {}          # object name -> select
+        self.active = None
+        self.keyframes = {}          # (object name, data path) -> {frame: value}
+        self.recorded = 0
+        self.applied = 0
+
+    @property
+    def coalesced(self):
+        return self.recorded - self.applied
+
+    def flush(self):
+        for create in self.created:
+            create()
+        self.applied += len(self.created)
+
+        for (name, attribute), value in self.transforms.items():
+            setattr(get_object(name), attribute, value)
+        self.applied += len(self.transforms)
+
+        for name, collection_name in self.collections.items():
+            move_to_collection(name, collection_name)
+        self.applied += len(self.collections)
+
+        if self.deselect_all:
+            bpy.ops.object.select_all(action='DESELECT')
+            self.applied += 1
+        for name, select in self.selection.items():
+            get_object(name).select_set(select)
+        if self.active is not None:
+            bpy.context.view_layer.objects.active = get_object(self.active)
+        self.applied += len(self.selection)
+
+        for (name, data_path), keys in self.keyframes.items():
+            frames = sorted(keys)
+            current = getattr(get_object(name), data_path)
+            values = [current if keys[f] is None else keys[f] for f in frames]
+            put_keyframes(name, frames, np.asarray(values, dtype = np.float32).reshape(len(frames), -1), data_path = data_path)
+        self.applied += len(self.keyframes)
+
+        bpy.context.view_layer.update()
+
+
+_batch = None
+
+
+@contextlib.contextmanager
+def batch():
+    """ It defers particle creation, transforms, selections, collection moves and keyframes
+    until the end of the block. A batch opened inside another one joins it
+
+    Example:
+        with bs.batch() as b:
+            ...
+        print(b.coalesced)
+    """
+    global _batch
+    if _batch is not None:
+        yield _batch
+        return
+
+    _batch = Batch()
+    try:
+        yield _batch
+    finally:
+        current, _batch = _batch, None
+    current.flush()
+
+
+def run_or_defer(function, particle = None):
+    """ It runs function now, or at the end of the current batch
+
+    Args:
+        function: creates the object
+        particle (Particle, optional): the particle being created, its position, rotation
+            and scale are the values keyframed by put_keyframe until the object exists
+    """
+    if _batch is None:
+        function()
+        return
+    _batch.created.append(function)
+    _batch.recorded += 1
+    if particle is not None:
+        for attribute, value in (("location", particle.position), ("rotation_euler", getattr(particle, "rotation", None)),
+                                 ("scale", getattr(particle, "scale", None))):
+            if value is not None:
+                _batch.initial[(particle.name, attribute)] = tuple(value)
+
+
+def set_attribute(name, attribute, value):
+    """ It sets an attribute (location, rotation_euler, scale, ...) of an object now,
+    or at the end of the current batch
+    """
+    if _batch is None:
+        setattr(get_object(name), attribute, value)
+    else:
+        _batch.transforms[(name, attribute)] = value
+        _batch.recorded += 1
+
+
 
 #=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
 # Scene settings 
@@ -24,16 +204,59 @@ def __purge_orphans():
             __purge_orphans()
 
 
-def clean_scene():
+def __batch_clean(keep_types, keep_collections):
+    kept_collections = set()
+    for name in keep_collections:
+        collection = bpy.data.collections.get(name)
+        if collection is not None:
+            kept_collections.add(collection)
+            kept_collections.update(collection.children_recursive)
+    kept_objects = set()
+    for collection in kept_collections:
+        kept_objects.update(collection.objects)
+
+    bpy.data.batch_remove([obj for obj in bpy.data.objects if obj.type not in keep_types and obj not in kept_objects])
+    bpy.data.batch_remove([c for c in bpy.data.collections if c not in kept_collections])
+
+    # the data left without users by the removed objects, in passes since removing
+    # the meshes leaves their materials without users, and so on
+    while True:
+        orphans = [d for datablocks in (bpy.data.meshes, bpy.data.curves, bpy.data.materials, bpy.data.actions, bpy.data.node_groups)
+                   for d in datablocks if d.users == 0]
+        if not orphans:
+            break
+        bpy.data.batch_remove(orphans)
+
+    for collection in kept_collections:
+        if collection.users == 0:   # its parent collection was removed
+            bpy.context.scene.collection.children.link(collection)
+    for obj in bpy.data.objects:
+        if not obj.users_collection:   # kept by type, but its collections were removed
+            bpy.context.scene.collection.objects.link(obj)
+    invalidate_index()
+
+
+def clean_scene(fast = False, keep_types = (), keep_collections = ()):
     """
     Removing all of the objects, collection, materials, particles,
     textures, images, curves, meshes, actions, nodes, and worlds from the scene
+
+    Args:
+        fast (bool, optional): remove the datablocks in bulk with bpy.data.batch_remove
+            instead of selecting and deleting through operators. Its cost is linear in the
+            number of objects. Worlds are left untouched in this mode. Defaults to False.
+        keep_types (tuple, optional): only with fast, object types that are kept, e.g. ('CAMERA', 'LIGHT')
+        keep_collections (tuple, optional): only with fast, names of collections that are kept with their objects
     """
     if bpy.context.active_object and bpy.context.active_object.mode == "EDIT":
         bpy.ops.object.editmode_toggle()
 
+    if fast:
+        __batch_clean(keep_types, keep_collections)
+        return
+
     for obj in bpy.data.objects:
-        select_particle(obj.name)
+        _select_now(obj.name)
 
     bpy.ops.object.select_all(action="SELECT")
     bpy.ops.object.delete()
@@ -41,6 +264,7 @@ def clean_scene():
     collection_names = [col.name for col in bpy.data.collections]
     for name in collection_names:
         bpy.data.collections.remove(bpy.data.collections[name])
+    invalidate_index()
 
     # in the case when you modify the world shader
     world_names = [world.name for world in bpy.data.worlds]
@@ -123,11 +347,27 @@ def select_particle(name, deselect_others = True, select = True, active = True):
         select (bool, optional): Defaults to True.
         active (bool, optional): Defaults to True.
     """
+    if _batch is not None:
+        if deselect_others:
+            _batch.deselect_all = True
+            _batch.selection.clear()
+        _batch.selection[name] = select
+        if active:
+            _batch.active = name
+        _batch.recorded += 1
+        return
+
+    _select_now(name, deselect_others, select, active)
+
+
+def _select_now(name, deselect_others = True, select = True, active = True):
+    # the selection an operator acts on has to be real, even inside a batch
     if deselect_others:
         bpy.ops.object.select_all(action='DESELECT')
-    bpy.data.objects[name].select_set(select)
+    obj = get_object(name)
+    obj.select_set(select)
     if active:
-        bpy.context.view_layer.objects.active = bpy.data.objects[name]
+        bpy.context.view_layer.objects.active = obj
 
 
 
@@ -142,14 +382,15 @@ def set_particle_visibility(name, hide_select = False, hide_in_viewport = False,
         hide_render (bool, optional): Defaults to False.
         particle_in_object_mode (bool, optional): at the end it puts on the object mode. Defaults to True.
     """
-    select_particle(name) # calling the function select_particle
-
-    bpy.data.objects[name].hide_select = hide_select
-    bpy.context.active_object.hide_set(hide_in_viewport) 
-    bpy.context.active_object.hide_viewport = globally_viewport
-    bpy.data.objects[name].hide_render = hide_render
-
-    if particle_in_object_mode and bpy.context.active_object.mode == 'EDIT':
+    obj = get_object(name)
+    obj.hide_select = hide_select
+    obj.hide_set(hide_in_viewport)
+    obj.hide_viewport = globally_viewport
+    obj.hide_render = hide_render
+
+    # leaving the edit mode is the only step that needs an operator (and a context)
+    if particle_in_object_mode and obj.mode == 'EDIT':
+        _select_now(name)
         bpy.ops.object.editmode_toggle()
 
 
@@ -167,17 +408,44 @@ def set_object_mode(mode = 'object'):
 
 def apply_transformations(name, location=True, rotation=True, scale=True):
     """
-    This function reset informations about position, rotation and scale of the particle
+    This function reset informations about position, rotation and scale of the particle.
+    It works on the object and its data directly (no operator, selection or active object
+    needed). Like the operator, it refuses data shared with other objects, and the children
+    keep their place
     """
-    set_particle_visibility(name)
+    obj = get_object(name)
+    transform_data = obj.data is not None and hasattr(obj.data, "transform")
+    if transform_data and obj.data.users > 1:
+        raise ValueError("cannot apply the transformations of %s, its data is shared by %d users (see make_single_user)" % (name, obj.data.users))
+    if obj.mode == 'EDIT':
+        set_particle_visibility(name)
+
+    loc, rot, sca = obj.matrix_basis.decompose()
+    kept = Matrix.LocRotScale(None if location else loc, None if rotation else rot, None if scale else sca)
+    applied = kept.inverted() @ obj.matrix_basis
+    if transform_data:
+        obj.data.transform(applied)
+        obj.data.update()
+    obj.matrix_basis = kept
+    for child in obj.children:
+        child.matrix_parent_inverse = applied @ child.matrix_parent_inverse
+
 
-    bpy.ops.object.transform_apply(location=location, rotation=rotation, scale=scale)
-    try:
-        name.position = ((0,0,0) if location else name.position)
-        name.rotation = ((0,0,0) if rotation else name.rotation)
-        name.scale = ((0,0,0) if scale else name.sclae)
-    except:
-        pass
+
+def make_single_user(name):
+    """ It gives the object its own copy of its data when the data is shared, e.g. the
+    meshes of apply_sphere_lod, so editing it does not change the other objects
+
+    Args:
+        name (str): the name of the object
+
+    Returns:
+        the data of the object
+    """
+    obj = get_object(name)
+    if obj.data is not None and obj.data.users > 1:
+        obj.data = obj.data.copy()
+    return obj.data
 
 
 
@@ -187,14 +455,12 @@ def create_collection(collection_name):
     Args:
         collection_name (str)
     """
-    exist = False
-    for c in list(bpy.data.collections):
-        if c.name == collection_name:
-            exist = True
-            break
-    if exist is False:
+    try:
+        get_collection(collection_name)
+    except KeyError:
         collection = bpy.data.collections.new(collection_name)
         bpy.context.scene.collection.children.link(collection)
+        _collections_index[collection.name] = collection
 
 
 def delete_object(name):
@@ -203,11 +469,23 @@ def delete_object(name):
     Args:
         name (str): the name of the particle you want to delete
     """
-    try:
-        select_particle(name)
-        bpy.ops.object.delete()
-    except:
-        pass
+    if _batch is not None:
+        # nothing recorded for the object must be applied after it is gone
+        for pending in (_batch.transforms, _batch.keyframes, _batch.initial):
+            for key in [k for k in pending if k[0] == name]:
+                del pending[key]
+        _batch.collections.pop(name, None)
+        _batch.selection.pop(name, None)
+        if _batch.active == name:
+            _batch.active = None
+        if name not in bpy.data.objects:   # created in this batch, so it is deleted after being created
+            _batch.created.append(lambda: delete_object(name))
+            _batch.recorded += 1
+            return
+
+    obj = bpy.data.objects.get(name)
+    if obj is not None:
+        bpy.data.objects.remove(obj, do_unlink = True)
 
 
 def move_to_collection(object_name, collection_name):
@@ -217,18 +495,21 @@ def move_to_collection(object_name, collection_name):
         object_name (str)
         collection_name (str)
     """
-    try:
-        bpy.data.collections[collection_name].objects.link(bpy.data.objects[object_name])
-        bpy.data.scenes['Scene'].collection.objects.unlink(bpy.data.objects[object_name])
-    except:
-        pass
+    if _batch is not None:
+        _batch.collections[object_name] = collection_name
+        _batch.recorded += 1
+        return
+
+    obj = get_object(object_name)
+    collection = get_collection(collection_name)
 
-    for c in list(bpy.data.collections):
-        if c.name != collection_name:
-            try:
-                c.objects.unlink(bpy.data.objects[object_name])
-            except:
-                pass
+    # users_collection only holds the collections the object is linked to,
+    # so there is no need to go through every collection of the file
+    for c in list(obj.users_collection):
+        if c != collection:
+            c.objects.unlink(obj)
+    if collection not in obj.users_collection:
+        collection.objects.link(obj)
 
 
 def put_keyframe(name, frame, data_path = 'location'):
@@ -239,11 +520,106 @@ def put_keyframe(name, frame, data_path = 'location'):
         frame (_type_): _description_
         data_path (str, optional): It can be "location", "rotation_euler", "scale", "hide_render". Defaults to 'location'.
     """
-    bpy.data.objects[name].keyframe_insert(
+    if _batch is not None:
+        # the value is taken now, since the object may still be moved in the batch
+        value = _batch.transforms.get((name, data_path), _batch.initial.get((name, data_path)))
+        if value is None and name in bpy.data.objects:
+            value = getattr(get_object(name), data_path)
+            value = tuple(value) if hasattr(value, "__len__") else value
+        _batch.keyframes.setdefault((name, data_path), {})[frame] = value
+        _batch.recorded += 1
+        return
+
+    get_object(name).keyframe_insert(
     data_path = data_path,
     frame = frame
     )
 
+def put_keyframes(name, frames, values, data_path = 'location', interpolation = 'BEZIER'):
+    """ It puts many keyframes at once, filling the F-curves from arrays instead of
+    calling keyframe_insert once per frame. As with keyframe_insert, a frame that already
+    has a key gets its value replaced (and a frame given twice keeps the last value)
+
+    Args:
+        name (str): the name of the object
+        frames (array): (T,) frame numbers
+        values (array): (T,) or (T, C) values, one column per channel of data_path
+        data_path (str, optional): It can be "location", "rotation_euler", "scale", "hide_render". Defaults to 'location'.
+        interpolation (str, optional): 'CONSTANT', 'LINEAR' or 'BEZIER'. Defaults to 'BEZIER'.
+    """
+    obj = get_object(name)
+    frames = np.asarray(frames, dtype = np.float32).reshape(-1)
+    if len(frames) == 0:   # e.g. an empty track, there is nothing to key
+        return
+    values = np.asarray(values, dtype = np.float32).reshape(len(frames), -1)
+    if np.any(np.diff(frames) <= 0):   # unsorted or repeated frames, the last value of a frame wins
+        _, last = np.unique(frames[::-1], return_index = True)
+        keep = len(frames) - 1 - last
+        frames, values = frames[keep], values[keep]
+
+    if obj.animation_data is None:
+        obj.animation_data_create()
+    if obj.animation_data.action is None:
+        obj.animation_data.action = bpy.data.actions.new(name + "Action")
+    fcurves = obj.animation_data.action.fcurves
+
+    keys = np.empty((len(frames), 2), dtype = np.float32)   # (frame, value) pairs, as foreach_set wants "co"
+    keys[:, 0] = frames
+    for index in range(values.shape[1]):
+        fcurve = fcurves.find(data_path, index = index) or fcurves.new(data_path, index = index, action_group = name)
+        points = fcurve.keyframe_points
+        start = len(points)
+
+        if start == 0:
+            keys[:, 1] = values[:, index]
+            points.add(len(keys))
+            points.foreach_set("co", keys.ravel())
+            replaced_rows = ()
+        else:
+            coordinates = np.empty(2 * start, dtype = np.float32)
+            points.foreach_get("co", coordinates)
+            rows = _find_frames(coordinates[0::2], frames)
+            replaced = rows >= 0
+            coordinates[2 * rows[replaced] + 1] = values[replaced, index]
+            added = np.stack((frames[~replaced], values[~replaced, index]), axis = 1)
+            points.add(len(added))
+            points.foreach_set("co", np.concatenate((coordinates, added.ravel())))
+            replaced_rows = rows[replaced]
+
+        if interpolation != 'BEZIER':
+            for row in np.concatenate((replaced_rows, np.arange(start, len(points)))).astype(np.int64):
+                points[int(row)].interpolation = interpolation
+        fcurve.update()
+
+
+def _find_frames(existing, frames):
+    """The index of the key of existing at each of frames, or -1 where there is none"""
+    rows = np.full(len(frames), -1, dtype = np.int64)
+    if len(existing):
+        order = np.argsort(existing, kind = 'stable')
+        found = np.minimum(np.searchsorted(existing[order], frames), len(existing) - 1)
+        match = existing[order[found]] == frames
+        rows[match] = order[found[match]]
+    return rows
+
+
+def put_keyframes_array(names, frames, values, data_path = 'location', interpolation = 'BEZIER'):
+    """ It animates many objects from one array
+
+    Args:
+        names (list): the names of the N objects
+        frames (array): (T,) frame numbers shared by all objects
+        values (array): (N, T, C) values, e.g. (N, T, 3) for locations
+        data_path (str, optional): Defaults to 'location'.
+        interpolation (str, optional): Defaults to 'BEZIER'.
+    """
+    values = np.asarray(values, dtype = np.float32)
+    if len(names) != len(values):
+        raise ValueError("got %d names for %d tracks" % (len(names), len(values)))
+    for name, track in zip(names, values):
+        put_keyframes(name, frames, track, data_path = data_path, interpolation = interpolation)
+
+
 def put_keyframe_vertices():
     bpy.data.window_managers['WinMan'].animall_properties['key_points']
     bpy.ops.anim.insert_keyframe_animall()
@@ -0,0 +1,170 @@
+import bpy
+import hashlib
+import json
+import os
+import pickle
+import numpy as np
+from . import setting
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Snapshot of the particle state on disk
+#
+# A snapshot is a folder with:
+#   index.json                                   names, digests and keyframed data paths
+#   transforms.npy                               (N, 9) position, rotation and scale
+#   keyframes_<path>_{offsets,frames,values}.npy the keyframes of every particle, concatenated
+#   data.pkl                                     the data of every particle
+# The .npy files are memory-mapped when loaded, so a large snapshot is not read whole.
+#
+# A particle state is a dict with the keys position, rotation, scale (tuples), keyframes
+# ({data_path: (frames (T,), values (T, C))}) and data; missing keys take default values
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+def particle_state(particle, keyframes = None):
+    """ It returns the state of a Particle object
+
+    Args:
+        particle (Particle)
+        keyframes (dict, optional): {data_path: (frames, values)}
+    """
+    return {"position": particle.position, "rotation": getattr(particle, "rotation", (0, 0, 0)),
+            "scale": getattr(particle, "scale", (1, 1, 1)), "keyframes": keyframes or {}, "data": particle.data}
+
+
+def _transforms(state):
+    return np.array(tuple(state.get("position", (0, 0, 0))) + tuple(state.get("rotation", (0, 0, 0))) + tuple(state.get("scale", (1, 1, 1))),
+                    dtype = np.float32)
+
+
+def _keyframes(state):
+    # an empty track is left out, as there is nothing to key
+    return {path: (np.asarray(frames, dtype = np.float32).reshape(-1), np.asarray(values, dtype = np.float32).reshape(len(frames), -1))
+            for path, (frames, values) in sorted(state.get("keyframes", {}).items()) if len(frames)}
+
+
+def _digest(state):
+    digest = hashlib.sha1(_transforms(state).tobytes())
+    for path, (frames, values) in _keyframes(state).items():
+        digest.update(path.encode())
+        digest.update(frames.tobytes())
+        digest.update(values.tobytes())
+    digest.update(pickle.dumps(state.get("data"), protocol = 4))
+    return digest.hexdigest()
+
+
+def save_snapshot(path, states):
+    """ It writes the states to the folder path, replacing the snapshot there
+
+    Args:
+        path (str): folder of the snapshot
+        states (dict): particle name -> particle state
+    """
+    _save(path, states, [_digest(s) for s in states.values()])
+
+
+def _save(path, states, digests):
+    os.makedirs(path, exist_ok = True)
+    names = list(states)
+    np.save(os.path.join(path, "transforms.npy"), np.array([_transforms(states[n]) for n in names], dtype = np.float32).reshape(-1, 9))
+
+    keyframes = [_keyframes(states[n]) for n in names]
+    data_paths = sorted({p for k in keyframes for p in k})
+    for data_path in data_paths:
+        tracks = [k.get(data_path, (np.zeros(0, np.float32), None)) for k in keyframes]
+        columns = max(v.shape[1] for _, v in tracks if v is not None)
+        offsets = np.concatenate(([0], np.cumsum([len(f) for f, _ in tracks]))).astype(np.int64)
+        frames = np.concatenate([f for f, _ in tracks]).astype(np.float32)
+        values = np.concatenate([v if v is not None else np.zeros((0, columns), np.float32) for _, v in tracks]).astype(np.float32)
+        np.save(os.path.join(path, "keyframes_%s_offsets.npy" % data_path), offsets)
+        np.save(os.path.join(path, "keyframes_%s_frames.npy" % data_path), frames)
+        np.save(os.path.join(path, "keyframes_%s_values.npy" % data_path), values)
+
+    with open(os.path.join(path, "data.pkl"), "wb") as f:
+        pickle.dump([states[n].get("data") for n in names], f, protocol = 4)
+    with open(os.path.join(path, "index.json"), "w") as f:
+        json.dump({"names": names, "digests": list(digests), "keyframes": data_paths}, f)
+
+
+def _read_index(path):
+    if not os.path.exists(os.path.join(path, "index.json")):
+        return None
+    with open(os.path.join(path, "index.json")) as f:
+        return json.load(f)
+
+
+def load_snapshot(path):
+    """ It opens a snapshot, the arrays are memory-mapped
+
+    Returns:
+        dict: names, digests, transforms (N, 9) and keyframes {data_path: (offsets, frames, values)},
+        or None if there is no snapshot in path
+    """
+    index = _read_index(path)
+    if index is None:
+        return None
+    index["transforms"] = np.load(os.path.join(path, "transforms.npy"), mmap_mode = "r")
+    index["keyframes"] = {p: tuple(np.load(os.path.join(path, "keyframes_%s_%s.npy" % (p, part)), mmap_mode = "r")
+                               for part in ("offsets", "frames", "values")) for p in index["keyframes"]}
+    return index
+
+
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Incremental rebuild
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+def _apply(name, state):
+    transforms = _transforms(state)
+    setting.set_attribute(name, "location", tuple(transforms[0:3]))
+    setting.set_attribute(name, "rotation_euler", tuple(transforms[3:6]))
+    setting.set_attribute(name, "scale", tuple(transforms[6:9]))
+    # inside a batch the keyframes are replaced at its end too, after the object is created
+    setting.run_or_defer(lambda: _apply_keyframes(name, state))
+
+
+def _apply_keyframes(name, state):
+    obj = setting.get_object(name)
+    if obj.animation_data is not None:
+        action = obj.animation_data.action
+        obj.animation_data_clear()
+        if action is not None and action.users == 0:   # else every rebuild would leave one orphan action
+            bpy.data.actions.remove(action)
+    for data_path, (frames, values) in _keyframes(state).items():
+        setting.put_keyframes(name, frames, values, data_path = data_path)
+
+
+def rebuild(path, states, factory = None):
+    """ It brings the scene to the given states touching only what changed since the
+    snapshot in path, then saves the new snapshot there
+
+    Args:
+        path (str): folder of the snapshot
+        states (dict): particle name -> particle state
+        factory (class, optional): Particle class of the added particles. Defaults to Sphere.
+
+    Returns:
+        dict: the names of the particles "added", "removed", "changed" and "unchanged"
+    """
+    from . import Sphere
+    factory = factory or Sphere
+
+    # only the index is read: the memory-mapped arrays would keep open the files saved below
+    snapshot = _read_index(path)
+    old = dict(zip(snapshot["names"], snapshot["digests"])) if snapshot else {}
+    digests = [_digest(s) for s in states.values()]
+    result = {"added": [], "removed": [], "changed": [], "unchanged": []}
+
+    result["removed"] = [n for n in old if n not in states]
+    bpy.data.batch_remove([bpy.data.objects[n] for n in result["removed"] if n in bpy.data.objects])
+
+    for (name, state), digest in zip(states.items(), digests):
+        if name not in bpy.data.objects:
+            factory(name = name, position = tuple(state.get("position", (0, 0, 0))), data = state.get("data"))
+            _apply(name, state)
+            result["added"].append(name)
+        elif old.get(name) != digest:
+            _apply(name, state)
+            result["changed"].append(name)
+        else:
+            result["unchanged"].append(name)
+
+    _save(path, states, digests)
+    return result
@@ -0,0 +1,154 @@
+import math
+import weakref
+import numpy as np
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Spatial index over particle positions
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+_tracking = weakref.WeakSet()     # the indexes kept up to date by Particle.move
+
+
+def moved(name, position):
+    """It is called by Particle.move to update the indexes that track the particle"""
+    for index in _tracking:
+        if name in index:
+            index.update(name, position)
+
+
+class SpatialIndex():
+    """This class keeps particle positions in a uniform grid of cubic cells, so the radius,
+       nearest neighbour and box queries only look at the particles of the nearby cells.
+       Parameters
+       ----------
+       names : list of strings
+       positions : array (N,3)
+       cell_size : float (defaults to about 2 particles per cell on average)
+       track : bool (if True, Particle.move updates the index)
+     """
+
+    def __init__(self, names = (), positions = None, cell_size = None, track = True):
+        names = list(names)
+        positions = np.asarray(positions if positions is not None else np.zeros((0, 3)), dtype = np.float64).reshape(-1, 3)
+        if cell_size is None:
+            extent = np.ptp(positions, axis = 0).max() if len(positions) > 1 else 1.0
+            cell_size = extent / max(1.0, (len(positions) / 2) ** (1 / 3)) or 1.0
+        self.cell_size = float(cell_size)
+
+        self._positions = np.empty((max(16, len(names)), 3))
+        self._names = []
+        self._ids = {}            # name -> row of _positions
+        self._free = []           # rows of removed particles
+        self._cells = {}          # (i, j, k) -> set of rows
+        for name, position in zip(names, positions):
+            self.insert(name, position)
+        if track:
+            _tracking.add(self)
+
+    @classmethod
+    def from_particles(cls, particles, cell_size = None, track = True):
+        """It builds the index from Particle objects (their name and position)"""
+        particles = list(particles)
+        return cls([p.name for p in particles], [p.position for p in particles], cell_size = cell_size, track = track)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def _cell(self, position):
+        return tuple(int(c) for c in np.floor(np.asarray(position) / self.cell_size))
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# Updates
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    def insert(self, name, position):
+        if name in self._ids:
+            return self.update(name, position)
+        if self._free:
+            row = self._free.pop()
+            self._names[row] = name
+        else:
+            row = len(self._names)
+            self._names.append(name)
+            if row == len(self._positions):
+                self._positions = np.concatenate((self._positions, np.empty_like(self._positions)))
+        self._ids[name] = row
+        self._positions[row] = position
+        self._cells.setdefault(self._cell(position), set()).add(row)
+
+    def update(self, name, position):
+        row = self._ids[name]
+        old, new = self._cell(self._positions[row]), self._cell(position)
+        self._positions[row] = position
+        if old != new:
+            self._discard(old, row)
+            self._cells.setdefault(new, set()).add(row)
+
+    def remove(self, name):
+        row = self._ids.pop(name)
+        self._discard(self._cell(self._positions[row]), row)
+        self._names[row] = None
+        self._free.append(row)
+
+    def _discard(self, cell, row):
+        rows = self._cells[cell]
+        rows.discard(row)
+        if not rows:
+            del self._cells[cell]
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# Queries
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    def _rows_in_cells(self, lower, upper):
+        """The rows of the particles in the cells touching the box lower..upper"""
+        low, high = self._cell(lower), self._cell(upper)
+        count = math.prod(h - l + 1 for l, h in zip(low, high))
+        if count > len(self._cells):
+            cells = [c for c in self._cells if all(l <= i <= h for i, l, h in zip(c, low, high))]
+        else:
+            cells = [c for c in np.ndindex(*(h - l + 1 for l, h in zip(low, high)))]
+            cells = [tuple(i + l for i, l in zip(c, low)) for c in cells]
+        rows = [r for c in cells for r in self._cells.get(c, ())]
+        return np.fromiter(rows, dtype = np.int64, count = len(rows))
+
+    def box(self, lower, upper):
+        """It returns the names of the particles inside the box lower..upper"""
+        lower, upper = np.asarray(lower, dtype = np.float64), np.asarray(upper, dtype = np.float64)
+        rows = self._rows_in_cells(lower, upper)
+        points = self._positions[rows]
+        inside = np.all((points >= lower) & (points <= upper), axis = 1)
+        return [self._names[r] for r in rows[inside]]
+
+    def radius(self, point, r):
+        """It returns the names of the particles at distance <= r from point, nearest first"""
+        point = np.asarray(point, dtype = np.float64)
+        rows = self._rows_in_cells(point - r, point + r)
+        distance = np.linalg.norm(self._positions[rows] - point, axis = 1)
+        order = np.argsort(distance)
+        return [self._names[rows[i]] for i in order if distance[i] <= r]
+
+    def nearest(self, point, k = 1):
+        """It returns the names and distances of the k particles nearest to point"""
+        point = np.asarray(point, dtype = np.float64)
+        k = min(k, len(self))
+        if k == 0:
+            return [], np.zeros(0)
+        r = self.cell_size
+        while True:
+            rows = self._rows_in_cells(point - r, point + r)
+            distance = np.linalg.norm(self._positions[rows] - point, axis = 1)
+            # the cells searched contain every particle closer than r
+            if np.count_nonzero(distance <= r) >= k or len(rows) == len(self):
+                order = np.argsort(distance)[:k]
+                return [self._names[rows[i]] for i in order], distance[order]
+            r *= 2
+
+    def associate(self, points, max_distance = np.inf):
+        """It returns, for each of the (M,3) points (e.g. samples of a track), the name of
+           the nearest particle (e.g. a Vertice hit) or None if it is farther than max_distance"""
+        names = []
+        for point in np.asarray(points, dtype = np.float64).reshape(-1, 3):
+            nearest, distance = self.nearest(point, 1)
+            names.append(nearest[0] if nearest and distance[0] <= max_distance else None)
+        return names
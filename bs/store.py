@@ -0,0 +1,159 @@
+import numpy as np
+from . import setting
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# Struct-of-arrays storage of the particle transforms
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+_ATTRIBUTES = ("location", "rotation_euler", "scale")
+
+
+class ParticleStore():
+    """This class keeps the position, rotation and scale of many particles in contiguous
+       (N,3) float32 arrays. Changes only mark rows as dirty, and sync() writes the dirty
+       rows (and only the changed transforms of each) to Blender in one pass.
+       Parameters
+       ----------
+       names : list of strings (names of existing objects)
+       positions, rotations, scales : arrays (N,3) (default to (0,0,0), (0,0,0) and (1,1,1))
+     """
+
+    def __init__(self, names = (), positions = None, rotations = None, scales = None):
+        self.names = list(names)
+        n = len(self.names)
+        self._rows = {name: row for row, name in enumerate(self.names)}
+        # the arrays have room for more rows than particles, so add() does not copy them every time
+        capacity = max(16, n)
+        self._positions = self._array(positions, n, 0, capacity)
+        self._rotations = self._array(rotations, n, 0, capacity)
+        self._scales = self._array(scales, n, 1, capacity)
+        self._dirty = np.zeros((capacity, 3), dtype = bool)    # one column per attribute of _ATTRIBUTES
+
+    @staticmethod
+    def _array(values, n, default, capacity):
+        array = np.full((capacity, 3), default, dtype = np.float32)
+        if values is not None:
+            array[:n] = np.asarray(values, dtype = np.float32).reshape(n, 3)
+        return array
+
+    @property
+    def positions(self):
+        return self._positions[:len(self.names)]
+
+    @property
+    def rotations(self):
+        return self._rotations[:len(self.names)]
+
+    @property
+    def scales(self):
+        return self._scales[:len(self.names)]
+
+    @property
+    def dirty(self):
+        return self._dirty[:len(self.names)]
+
+    @classmethod
+    def from_particles(cls, particles):
+        """It builds the store from Particle objects"""
+        particles = list(particles)
+        return cls([p.name for p in particles], [p.position for p in particles],
+                   [getattr(p, "rotation", (0, 0, 0)) for p in particles], [getattr(p, "scale", (1, 1, 1)) for p in particles])
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def __getitem__(self, key):
+        return ParticleView(self, self._rows[key] if isinstance(key, str) else int(key))
+
+    def __iter__(self):
+        return (ParticleView(self, row) for row in range(len(self.names)))
+
+    def add(self, name, position = (0, 0, 0), rotation = (0, 0, 0), scale = (1, 1, 1)):
+        """It appends a particle (its object must exist when sync is called)"""
+        row = len(self.names)
+        if row == len(self._dirty):   # the capacity doubles, so adding N particles copies O(N) rows
+            self._positions, self._rotations, self._scales, self._dirty = (np.concatenate((a, np.empty_like(a)))
+                for a in (self._positions, self._rotations, self._scales, self._dirty))
+        self.names.append(name)
+        self._rows[name] = row
+        self._positions[row] = position
+        self._rotations[row] = rotation
+        self._scales[row] = scale
+        self._dirty[row] = True
+        return ParticleView(self, row)
+
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# Bulk changes and synchronization
+#=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    def _set(self, column, array, values, rows):
+        if rows is None:
+            rows = np.arange(len(self.names))
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        values = np.asarray(values, dtype = np.float32)
+        changed = np.any(array[rows] != values, axis = -1)
+        array[rows] = values
+        self.dirty[rows[changed], column] = True
+
+    def set_positions(self, values, rows = None):
+        """It writes (N,3) positions, or only those of rows (indices or a boolean mask)"""
+        self._set(0, self.positions, values, rows)
+
+    def set_rotations(self, values, rows = None):
+        self._set(1, self.rotations, values, rows)
+
+    def set_scales(self, values, rows = None):
+        self._set(2, self.scales, values, rows)
+
+    def sync(self):
+        """ It writes the changed transforms to Blender and clears the dirty mask
+
+        Returns:
+            int: the number of objects written
+        """
+        rows = np.flatnonzero(self.dirty.any(axis = 1))
+        arrays = (self.positions, self.rotations, self.scales)
+        for row in rows:
+            obj = setting.get_object(self.names[row])
+            for column in np.flatnonzero(self.dirty[row]):
+                setattr(obj, _ATTRIBUTES[column], arrays[column][row])
+        self.dirty[:] = False
+        return len(rows)
+
+
+
+class ParticleView():
+    """Light access to one particle of a ParticleStore, with the move/rotate/resize of Particle"""
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    @property
+    def name(self):
+        return self._store.names[self._row]
+
+    @property
+    def position(self):
+        return tuple(self._store.positions[self._row].tolist())
+
+    @property
+    def rotation(self):
+        return tuple(self._store.rotations[self._row].tolist())
+
+    @property
+    def scale(self):
+        return tuple(self._store.scales[self._row].tolist())
+
+    def move(self, x = 0, y = 0, z = 0):
+        self._store.set_positions((x, y, z), [self._row])
+
+    def rotate(self, yz = 0, zx = 0, xy = 0):
+        self._store.set_rotations((yz, zx, xy), [self._row])
+
+    def resize(self, sx = 1, sy = 1, sz = 1):
+        self._store.set_scales((sx, sy, sz), [self._row])
@@ -11,6 +11,7 @@ setup(
     version="0.1.0",
     packages=find_packages(include=["ps", "ps.*"]),
     install_requires=["pandas",
+                      "pyarrow",
                       "scipy",
                       "pysqlite3"]
 )
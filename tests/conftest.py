@@ -0,0 +1,13 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# outside Blender, bs is imported against the fake bpy of the benchmarks
+try:
+    import bpy
+except ImportError:
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    import fake_bpy
+    fake_bpy.install()
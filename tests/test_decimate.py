@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from bs import decimate_track
+
+
+def _distance_to_polyline(points, line):
+    """Distance from each of points to the nearest segment of line"""
+    start, end = line[:-1], line[1:]
+    segment = end - start
+    t = np.einsum("psk,sk->ps", points[:, None] - start, segment) / np.maximum(np.einsum("sk,sk->s", segment, segment), 1e-300)
+    nearest = start + np.clip(t, 0, 1)[..., None] * segment
+    return np.linalg.norm(points[:, None] - nearest, axis = 2).min(axis = 1)
+
+
+def test_straight_line_keeps_the_ends():
+    points = np.linspace(0, 1, 50)[:, None] * [1, 2, 3]
+    assert np.array_equal(decimate_track(points, 1e-6), points[[0, -1]])
+
+
+def test_corners_are_kept():
+    points = np.array([[0, 0, 0], [1, 0, 0], [2, 0, 0], [2, 1, 0], [2, 2, 0], [3, 2, 0]], dtype = float)
+    assert np.array_equal(decimate_track(points, 0.1), points[[0, 2, 4, 5]])
+
+
+def test_helix_stays_within_tolerance():
+    t = np.linspace(0, 4 * np.pi, 10000)
+    points = np.column_stack((np.cos(t), np.sin(t), 0.1 * t))
+    kept = decimate_track(points, 1e-3)
+    assert len(kept) < len(points) / 20
+    assert np.array_equal(kept[[0, -1]], points[[0, -1]])
+    assert _distance_to_polyline(points, kept).max() <= 1e-3
+
+
+def test_without_tolerance_every_point_is_kept():
+    points = np.random.default_rng(0).normal(size = (20, 3))
+    assert np.array_equal(decimate_track(points), points)
+    assert np.array_equal(decimate_track(points[:2], 10), points[:2])
+
+
+def test_empty_track_is_rejected():
+    with pytest.raises(ValueError):
+        decimate_track(np.zeros((0, 3)), 1e-3)
@@ -0,0 +1,52 @@
+import numpy as np
+from bs import integrator
+
+
+def _fit_circle(points):
+    """Center and radius of the circle through (M,2) points, by least squares"""
+    a = np.column_stack((2 * points, np.ones(len(points))))
+    b = np.sum(points**2, axis = 1)
+    cx, cy, c = np.linalg.lstsq(a, b, rcond = None)[0]
+    return np.array([cx, cy]), np.sqrt(c + cx**2 + cy**2)
+
+
+def test_radius_in_uniform_field():
+    tracks = integrator.integrate([[0, 0, 0]], [[1, 0, 0]], [1], field = (0, 0, 2), dt = 0.01, steps = 2000)
+    _, radius = _fit_circle(tracks[0, :, :2].astype(np.float64))
+    expected = 1 / (integrator.SPEED_OF_LIGHT * 1 * 2)
+    assert abs(radius - expected) / expected < 1e-5
+    assert np.allclose(tracks[0, :, 2], 0)
+
+
+def test_opposite_charges_bend_opposite_ways():
+    tracks = integrator.integrate([[0, 0, 0]] * 2, [[1, 0, 0]] * 2, [1, -1], steps = 50)
+    assert np.allclose(tracks[0, :, 1], -tracks[1, :, 1], atol = 1e-6)
+    assert tracks[0, -1, 1] != 0
+
+
+def test_neutral_particle_goes_straight():
+    p, mass, dt, steps = np.array([0.3, 0.4, 0.0]), integrator.PION_MASS, 0.01, 100
+    tracks = integrator.integrate([[1, 2, 3]], [p], [0], masses = mass, dt = dt, steps = steps)
+    velocity = integrator.SPEED_OF_LIGHT * p / np.sqrt(p @ p + mass**2)
+    expected = np.array([1, 2, 3]) + np.arange(steps + 1)[:, None] * dt * velocity
+    assert np.allclose(tracks[0], expected, atol = 1e-5)
+
+
+def test_chunks_and_record_every():
+    rng = np.random.default_rng(0)
+    positions, momenta = rng.normal(size = (7, 3)), rng.normal(size = (7, 3))
+    charges = rng.choice([-1, 0, 1], size = 7)
+    whole = integrator.integrate(positions, momenta, charges, steps = 40, chunk_size = 100)
+    chunked = integrator.integrate(positions, momenta, charges, steps = 40, chunk_size = 3)
+    sampled = integrator.integrate(positions, momenta, charges, steps = 40, record_every = 4)
+    assert np.array_equal(whole, chunked)
+    assert sampled.shape == (7, 11, 3)
+    assert np.allclose(sampled, whole[:, ::4], atol = 1e-6)
+
+
+def test_tabulated_field():
+    values = np.zeros((3, 3, 3, 3))
+    values[..., 2] = np.linspace(0, 2, 3)[:, None, None]   # Bz grows along x from 0 to 2
+    field = integrator.tabulated_field(values, (0, 0, 0), (2, 2, 2))
+    result = field(np.array([[0.5, 1, 1], [1.5, 0.2, 1.9], [3, 1, 1]]))
+    assert np.allclose(result, [[0, 0, 0.5], [0, 0, 1.5], [0, 0, 0]])
@@ -0,0 +1,55 @@
+import numpy as np
+from bs import spatial
+
+
+def _index(n = 500, seed = 0, **kwargs):
+    positions = np.random.default_rng(seed).uniform(-5, 5, size = (n, 3))
+    names = ["p%d" % i for i in range(n)]
+    return spatial.SpatialIndex(names, positions, track = False, **kwargs), names, positions
+
+
+def test_radius_matches_brute_force():
+    index, names, positions = _index()
+    point = np.array([0.5, -1, 2])
+    distance = np.linalg.norm(positions - point, axis = 1)
+    expected = [names[i] for i in np.argsort(distance) if distance[i] <= 2.5]
+    assert index.radius(point, 2.5) == expected
+
+
+def test_nearest_matches_brute_force():
+    index, names, positions = _index(cell_size = 0.3)
+    for point in ([0, 0, 0], [20, 20, 20], [-4.9, 4.9, 0]):
+        distance = np.linalg.norm(positions - point, axis = 1)
+        order = np.argsort(distance)[:7]
+        found, found_distance = index.nearest(point, 7)
+        assert found == [names[i] for i in order]
+        assert np.allclose(found_distance, distance[order])
+
+
+def test_box_matches_brute_force():
+    index, names, positions = _index()
+    lower, upper = np.array([-1, -2, -3]), np.array([2, 1, 0])
+    inside = np.all((positions >= lower) & (positions <= upper), axis = 1)
+    assert sorted(index.box(lower, upper)) == sorted(np.array(names)[inside])
+
+
+def test_update_and_remove():
+    index, names, positions = _index(n = 50)
+    index.update("p3", (100, 100, 100))
+    index.remove("p4")
+    assert index.nearest((100, 100, 99), 1)[0] == ["p3"]
+    assert "p4" not in index and len(index) == 49
+    assert "p4" not in index.radius(positions[4], 1e-9)
+    index.insert("p4", (50, 50, 50))
+    assert index.box((49, 49, 49), (51, 51, 51)) == ["p4"]
+
+
+def test_associate():
+    index = spatial.SpatialIndex(["a", "b"], [[0, 0, 0], [10, 0, 0]], track = False)
+    assert index.associate([[1, 0, 0], [9, 0, 0], [5, 50, 0]], max_distance = 2) == ["a", "b", None]
+
+
+def test_moved_updates_tracked_indexes():
+    index = spatial.SpatialIndex(["a"], [[0, 0, 0]], cell_size = 1)
+    spatial.moved("a", (7, 7, 7))
+    assert index.box((6, 6, 6), (8, 8, 8)) == ["a"]